@@ -1,13 +1,4 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import time
-
-import plotly.express as px
-from plotly.subplots import make_subplots
-import plotly.graph_objects as go
 
 # ---------------- SETTINGS -------------------
 page_title = 'Elektrische Laadpalen'
@@ -22,9 +13,13 @@ st.set_page_config(
 )
 
 # ----------------- DATA ----------------------
-from data.OpenChargeMapAPI import realTimeLaadPalenData as df_ocm
-from data.OpenDataRDW import rdw_data as df_rdw
-from data.laadpaaldata import laadpaal_data as df_lp
+from monitoring import instrument
+instrument.page('Home')
+
+# Wat de pagina toont komt uit data/views.py: berekend uit de gedeelde datasets, of met
+# DASHBOARD_PRECOMPUTED=1 uit vooraf berekende Parquet bestanden. Er wordt steeds één dataset getoond,
+# dus de views en de zware imports (plotly) worden pas in de gekozen tak hieronder geladen.
+from data import refresh, views
 
 # ----------------- PAGES ---------------------
 st.title(page_title + ' ' + page_icon)
@@ -49,104 +44,99 @@ selected_df = st.selectbox("Selecteer hieronder een optie om de gebruikte data i
 
 # Display the selected DataFrame
 if selected_df == "Laadpaaldata":
-    st.write(df_lp.head())
-    st.subheader("Interactive Scatter Plot")
-    fig = px.scatter(df_lp, x="Started", y="TotalEnergy",
-                     title="Charging Session Energy vs. Start Time")
-    st.plotly_chart(fig)
+    with instrument.section('laadpaaldata'):
+        from charts.scatter import scatter
+        with instrument.section('load'):
+            lp_head = views.get('laadpaaldata_head')
+            # Maximaal POINT_BUDGET punten, gekozen met LTTB zodat de vorm van de tijdreeks behouden blijft
+            lp_points = views.get('laadpaaldata_points')
+        st.write(lp_head)
+        st.subheader("Interactive Scatter Plot")
+        fig, _ = scatter(lp_points, x="Started", y="TotalEnergy", mode='lttb',
+                         title="Charging Session Energy vs. Start Time")
+        instrument.plotly_chart(fig)
+        dropped = lp_points.attrs['rows'] - len(lp_points)
+        if dropped:
+            st.caption(f"{dropped} van de {lp_points.attrs['rows']} sessies zijn niet getekend om de grafiek snel te houden.")
 
 if selected_df == "RDW":
-    st.write(df_rdw.head())
-    progress_text = "🏃 Loading..."
-    my_bar = st.progress(0, text=progress_text)
-    # Assuming you have date columns for both dates
-    df_rdw['Datum tenaamstelling DT'] = pd.to_datetime(
-        df_rdw['Datum tenaamstelling DT'])
-    df_rdw['Datum eerste tenaamstelling in Nederland DT'] = pd.to_datetime(
-        df_rdw['Datum eerste tenaamstelling in Nederland DT'])
-    # Extract the month from both dates
-    df_rdw['Month_Tenaamstelling'] = df_rdw['Datum tenaamstelling DT'].dt.month
-    df_rdw['Month_EersteTenaamstelling'] = df_rdw['Datum eerste tenaamstelling in Nederland DT'].dt.month
-
-    # Count the number of registrations for each month and date
-    monthly_counts = df_rdw['Month_Tenaamstelling'].value_counts(
-    ).reset_index()
-    monthly_counts.columns = ['Month', 'Registrations_Tenaamstelling']
-
-    monthly_counts_eerste_tenaamstelling = df_rdw['Month_EersteTenaamstelling'].value_counts(
-    ).reset_index()
-    monthly_counts_eerste_tenaamstelling.columns = [
-        'Month', 'Registrations_EersteTenaamstelling']
-
-    # Merge the two DataFrames on the 'Month' column
-    merged_counts = monthly_counts.merge(
-        monthly_counts_eerste_tenaamstelling, on='Month', how='outer').fillna(0)
-    
-    for percent_complete in range(100):
-        time.sleep(0.01)
-        my_bar.progress(percent_complete + 1, text=progress_text)
-    time.sleep(1)
-    my_bar.empty()
-
-    st.write('''
-                ## 🚘 Registraties per maand
-                ''')
-    # Create a grouped bar chart
-    fig = px.bar(
-        merged_counts,
-        x='Month',
-        y=['Registrations_Tenaamstelling', 'Registrations_EersteTenaamstelling'],
-        title='Aantal voertuigregistraties per maand',
+    with instrument.section('rdw'):
+        import plotly.express as px
+        with instrument.section('load'):
+            rdw_head = views.get('rdw_head')
+            # De maandtellingen worden eenmalig per versie van de dataset berekend en daarna uit de cache gehaald
+            merged_counts = views.get('rdw_monthly')
+        st.write(rdw_head)
+
+        st.write('''
+                    ## 🚘 Registraties per maand
+                    ''')
+        # Create a grouped bar chart
+        fig = px.bar(
+            merged_counts,
+            x='Month',
+            y=['Registrations_Tenaamstelling', 'Registrations_EersteTenaamstelling'],
+            title='Aantal voertuigregistraties per maand',
         
-    )
+        )
 
-    st.plotly_chart(fig)
+        instrument.plotly_chart(fig)
 
 if selected_df == "Open Charge Map":
-    st.write(df_ocm[['ID','OperatorID','UsageTypeID','UsageCost','Connections','NumberOfPoints','DateCreated','OperatorInfo.Title',
-    'UsageType.IsPayAtLocation','UsageType.IsMembershipRequired','UsageType.IsAccessKeyRequired','UsageType.ID',
-    'UsageType.Title','StatusType.IsOperational','AddressInfo.AddressLine1','AddressInfo.Town','AddressInfo.StateOrProvince']].head())
+    with instrument.section('ocm'):
+        import plotly.express as px
+        from plotly.subplots import make_subplots
+        from charts.histogram import category_trace, histogram_figure
+        with instrument.section('load'):
+            ocm_head = views.get('ocm_head')
+        st.write(ocm_head)
+        # Met OCM_REFRESH_INTERVAL wordt de data op de achtergrond ververst (zie data/refresh.py)
+        ocm_status = refresh.status()
+        if ocm_status['refreshed_at']:
+            st.caption(f"Laatst gecontroleerd op nieuwe data: {ocm_status['age_seconds'] / 60:.0f} minuten geleden "
+                       f"(in {ocm_status['duration_seconds']:.1f}s)")
     
-    st.subheader("🔎 Data Exploratie")
-    fig = make_subplots(
-        rows=5, cols=3,
-        horizontal_spacing=0.05, vertical_spacing=0.075,  
-        specs=[ 
-            [{"rowspan": 2}, {"rowspan": 2}, {"rowspan": 2}],
-            [None, None, None],
-            [{"colspan": 3, "rowspan": 3}, None, None],
-            [None, None, None],
-            [None, None, None]
-        ],
-        subplot_titles=("% Operationele laadpalen", "% Laadpalen met fast charging", " % Laadpalen met membership", "Aantal laadpalen per stad")
-    )
-    # Hoeveel procent van de locaties zijn operationeel?
-    fig.add_trace(go.Histogram(x=df_ocm['StatusType.IsOperational'], histnorm='percent', marker_color=['#00CC96', '#EF553B']), row=1, col=1)
-    # Hoeveel procent van de locaties heeft fast charging?
-    fig.add_trace(go.Histogram(x=df_ocm['Connection.Level.IsFastChargeCapable'], histnorm='percent', marker_color=['#EF553B', '#00CC96']), row=1, col=2)
-    # Bij hoeveel percentage van de locaties heb je een membership nodig?
-    fig.add_trace(go.Histogram(x=df_ocm['UsageType.IsMembershipRequired'], histnorm='percent', marker_color=['#00CC96', '#EF553B']), row=1, col=3)
-    # Hoeveel locaties zijn er per stad? (geeft top 25)
-    # fig.add_trace(go.Histogram(y=df_ocm['AddressInfo.Town'].value_counts().sort_values(ascending=True).head(25).index, marker_color='#636EFA'), row=3, col=1)
-    fig.add_trace(go.Bar(x=df_ocm['AddressInfo.Town'].value_counts().sort_values(ascending=False).head(25).index,
-                     y=df_ocm['AddressInfo.Town'].value_counts().sort_values(ascending=False).head(25),
-                     marker_color='#636EFA'), row=3, col=1)
+        st.subheader("🔎 Data Exploratie")
+        fig = make_subplots(
+            rows=5, cols=3,
+            horizontal_spacing=0.05, vertical_spacing=0.075,  
+            specs=[ 
+                [{"rowspan": 2}, {"rowspan": 2}, {"rowspan": 2}],
+                [None, None, None],
+                [{"colspan": 3, "rowspan": 3}, None, None],
+                [None, None, None],
+                [None, None, None]
+            ],
+            subplot_titles=("% Operationele laadpalen", "% Laadpalen met fast charging", " % Laadpalen met membership", "Aantal laadpalen per stad")
+        )
+        # De aantallen worden op de server geteld (per versie van de dataset), alleen die gaan naar de browser
+        # Hoeveel procent van de locaties zijn operationeel?
+        fig.add_trace(category_trace(views.counts('ocm_flag_counts', 'StatusType.IsOperational'), histnorm='percent', marker_color=['#00CC96', '#EF553B']), row=1, col=1)
+        # Hoeveel procent van de locaties heeft fast charging?
+        fig.add_trace(category_trace(views.counts('ocm_flag_counts', 'Connection.Level.IsFastChargeCapable'), histnorm='percent', marker_color=['#EF553B', '#00CC96']), row=1, col=2)
+        # Bij hoeveel percentage van de locaties heb je een membership nodig?
+        fig.add_trace(category_trace(views.counts('ocm_flag_counts', 'UsageType.IsMembershipRequired'), histnorm='percent', marker_color=['#00CC96', '#EF553B']), row=1, col=3)
+        # Hoeveel locaties zijn er per stad? (geeft top 25)
+        fig.add_trace(category_trace(views.counts('ocm_town_counts'), marker_color='#636EFA'), row=3, col=1)
     
-    fig.update_layout(height=800, width=800, title_text="Elektrische laadpalen in Nederland", showlegend=False)
-    fig.update_annotations(font_size=12) # subplot titels
-    st.plotly_chart(fig)
-
-    # Histogram for 'Connection.PowerKW'
-    st.subheader("⚡ Verdeling PowerKW")
-    fig2 = px.histogram(df_ocm, x="Connection.PowerKW")
-    st.plotly_chart(fig2)
+        fig.update_layout(height=800, width=800, title_text="Elektrische laadpalen in Nederland", showlegend=False)
+        fig.update_annotations(font_size=12) # subplot titels
+        instrument.plotly_chart(fig)
+
+        # Histogram for 'Connection.PowerKW'
+        st.subheader("⚡ Verdeling PowerKW")
+        fig2 = histogram_figure(views.histogram('ocm_power_histogram'), x="Connection.PowerKW")
+        instrument.plotly_chart(fig2)
     
-    # Linechart for registration over time
-    st.subheader("📅 Laadpaal registraties 2010-2023")
-    # Convert 'DateCreated' column to datetime
-    df_ocm['DateCreated'] = pd.to_datetime(df_ocm['DateCreated'])
-    # Group the data by date and count the number of rows created on each date
-    daily_counts = df_ocm.groupby(df_ocm['DateCreated'].dt.date)['DateCreated'].count()
-    # Create a line chart
-    fig3 = px.line(x=daily_counts.index, y=daily_counts.values, labels={"x": "Date", "y": "Number of Rows Created"})
-    st.plotly_chart(fig3)
\ No newline at end of file
+        # Linechart for registration over time
+        st.subheader("📅 Laadpaal registraties 2010-2023")
+        # The number of rows created on each date
+        daily_counts = views.get('ocm_daily_registrations')
+        # Create a line chart
+        fig3 = px.line(x=daily_counts['Date'], y=daily_counts['count'], labels={"x": "Date", "y": "Number of Rows Created"})
+        instrument.plotly_chart(fig3)
+
+instrument.debug_panel()
+
+# Na de eerste run de overige views op de achtergrond laden (alleen met DASHBOARD_WARMUP=1)
+views.warm_up()
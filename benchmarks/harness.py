@@ -0,0 +1,161 @@
+import argparse
+import io
+import json
+import resource
+import runpy
+import statistics
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Draait een pagina van het dashboard zonder browser. De widgets geven de waardes uit een
+# interactie terug (of hun standaardwaarde) en de grafieken worden niet verstuurd maar gemeten:
+# het aantal bytes dat Streamlit naar de browser zou sturen. Wordt per pagina in een eigen proces
+# gestart door benchmarks/run.py, met de synthetische data in de werkmap.
+
+_widgets = {}
+_payload = {'bytes': 0, 'elements': 0}
+
+
+def _lookup(label, default):
+    # Een interactie noemt widgets bij (het begin van) hun label
+    for key, value in _widgets.items():
+        if label.startswith(key):
+            return value
+    return default
+
+
+def _selectbox(label, options, index=0, *args, **kwargs):
+    options = list(options)
+    value = _lookup(label, options[index] if options and index is not None else None)
+    return value if value in options else (options[0] if options else None)
+
+
+def _multiselect(label, options, default=None, *args, **kwargs):
+    options = list(options)
+    return [value for value in _lookup(label, default or []) if value in options]
+
+
+def _slider(label, min_value=None, max_value=None, value=None, *args, **kwargs):
+    return _lookup(label, value if value is not None else min_value)
+
+
+def _checkbox(label, value=False, *args, **kwargs):
+    return _lookup(label, value)
+
+
+def _date_input(label, value=None, *args, **kwargs):
+    # Een interactie geeft datums als ISO tekst, een periode als lijst van twee
+    from datetime import date
+    value = _lookup(label, value)
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, list):
+        return tuple(date.fromisoformat(item) for item in value)
+    return value
+
+
+def _measure(size):
+    _payload['bytes'] += size
+    _payload['elements'] += 1
+
+
+def _plotly_chart(figure, use_container_width=False, sharing='streamlit', theme='streamlit', **kwargs):
+    # Dezelfde serialisatie als st.plotly_chart, de grootte is die van het protobuf bericht
+    from streamlit.elements.plotly_chart import marshall
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+    proto = PlotlyChart()
+    marshall(proto, figure, use_container_width, sharing, theme, **kwargs)
+    _measure(proto.ByteSize())
+
+
+def _pyplot(figure=None, *args, **kwargs):
+    # st.pyplot stuurt een PNG
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    _measure(buffer.tell())
+
+
+def _dataframe(data, *args, **kwargs):
+    from streamlit.elements.arrow import marshall
+    from streamlit.proto.Arrow_pb2 import Arrow
+    proto = Arrow()
+    marshall(proto, data)
+    _measure(proto.ByteSize())
+
+
+def _write(*items, **kwargs):
+    import pandas as pd
+    for item in items:
+        if isinstance(item, pd.DataFrame):
+            _dataframe(item)
+
+
+def _st_folium(figure, *args, **kwargs):
+    _measure(len(figure.get_root().render()))
+    # Wat de kaart teruggeeft (bijvoorbeeld last_clicked) staat in de interactie onder 'st_folium'
+    return _lookup('st_folium', {})
+
+
+def patch_streamlit():
+    import streamlit_folium
+    st.selectbox = _selectbox
+    st.multiselect = _multiselect
+    st.slider = _slider
+    st.checkbox = _checkbox
+    st.date_input = _date_input
+    st.plotly_chart = _plotly_chart
+    st.pyplot = _pyplot
+    st.dataframe = _dataframe
+    st.write = _write
+    streamlit_folium.st_folium = _st_folium
+
+
+def run_page(script, widgets=None):
+    # Eén run van de pagina, zoals een rerun in Streamlit: de caches blijven bewaard tussen runs
+    get_script_run_ctx().reset()
+    _widgets.clear()
+    _widgets.update(widgets or {})
+    _payload.update(bytes=0, elements=0)
+    started = time.perf_counter()
+    runpy.run_path(script, run_name='__main__')
+    return {'seconds': time.perf_counter() - started, 'payload_bytes': _payload['bytes'], 'elements': _payload['elements']}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB op Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main(script, interactions, repeat):
+    patch_streamlit()
+    # Zonder ScriptRunContext cachen st.cache_data en st.cache_resource niets; net als een sessie in
+    # `streamlit run` krijgen alle runs van de pagina dezelfde context
+    from data.registry import add_detached_context
+    add_detached_context()
+    # De eerste run bevat de imports en het inladen van de data (koud of vanuit de Parquet cache)
+    first = run_page(script, interactions[0][1] if interactions else None)
+    results = [{'interaction': 'load', **first}]
+    for name, widgets in interactions:
+        runs = [run_page(script, widgets) for _ in range(repeat)]
+        seconds = [run['seconds'] for run in runs]
+        results.append({
+            'interaction': name,
+            'seconds': statistics.median(seconds),
+            'seconds_max': max(seconds),
+            'payload_bytes': runs[-1]['payload_bytes'],
+            'elements': runs[-1]['elements'],
+        })
+    return {'peak_rss_mb': round(peak_rss_mb(), 1), 'runs': results}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Draai één pagina van het dashboard zonder browser')
+    parser.add_argument('script')
+    parser.add_argument('--interactions', default='[]', help='JSON lijst van [naam, {label: waarde}]')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    results = main(args.script, json.loads(args.interactions), args.repeat)
+    # Pagina's printen zelf ook naar stdout, daarom staan de resultaten op één regel met een vast voorvoegsel
+    print('BENCHMARK ' + json.dumps(results))
@@ -0,0 +1,143 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.synthetic import REPO, write_datasets
+
+# Benchmark van alle pagina's van het dashboard, zonder browser, op synthetische data van
+# verschillende grootte. Per pagina en schaal wordt gemeten:
+#   load   - de eerste run in een nieuw proces, koud (lege data/.cache) en warm (Parquet cache aanwezig)
+#   rerun  - de mediaan van een rerun per interactie (widget waardes), met warme Streamlit caches
+#   payload_bytes - wat de grafieken en tabellen naar de browser zouden sturen
+#   peak_rss_mb   - het piekgeheugen van het proces
+# Gebruik: python -m benchmarks.run [--scales 1 10 100] [--pages Home_overview.py ...]
+#          python -m benchmarks.run --compare benchmarks/results/oud.json benchmarks/results/nieuw.json
+
+RESULTS_DIR = os.path.join(REPO, 'benchmarks', 'results')
+
+# Interacties per pagina: een naam en de waardes van de widgets (op het begin van hun label)
+INTERACTIONS = {
+    'Home_overview.py': [
+        ('ocm', {'Selecteer hieronder': 'Open Charge Map'}),
+        ('laadpaaldata', {'Selecteer hieronder': 'Laadpaaldata'}),
+        ('rdw', {'Selecteer hieronder': 'RDW'}),
+    ],
+    'pages/2_Laadpaal_data.py': [
+        ('default', {}),
+        ('period_march', {'Selecteer een periode': ['2018-03-01', '2018-03-31']}),
+    ],
+    'pages/3_Laadpaal_locaties.py': [
+        ('all_provinces', {}),
+        ('one_province', {'Selecteer Provincie': ['Utrecht']}),
+        ('cumulative_2020', {'Selecteer Provincie': ['Utrecht', 'Noord-Holland'], 'Selecteer een jaar': 2020,
+                             'Welke data': 'Cumulatief aantal laadpalen'}),
+        ('per_km2', {'Welke data': 'Laadpalen per km2'}),
+        ('hexagons_5km', {'Toon de laadpalen als': 'Hexagonen van 5 km', 'Welke data': 'Cumulatief aantal laadpalen'}),
+        ('hexagons_2km', {'Toon de laadpalen als': 'Hexagonen van 2 km'}),
+        ('nearest_click', {'st_folium': {'last_clicked': {'lat': 52.09, 'lng': 5.12}}, 'Straal': 10}),
+        ('nearest_fast', {'st_folium': {'last_clicked': {'lat': 52.09, 'lng': 5.12}}, 'Alleen snelladers': True}),
+    ],
+    'pages/4_Elektrische_voertuigen.py': [
+        ('default', {}),
+        ('top_15_tesla', {'Selecteer het aantal automerken': 15, 'Selecteer een automerk': 'TESLA'}),
+    ],
+}
+
+
+def run_page(workdir, page, repeat):
+    # Elke meting in een nieuw proces, zodat imports, Streamlit caches en het piekgeheugen niet doorlopen
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO, os.environ.get('PYTHONPATH')])))
+    command = [sys.executable, '-m', 'benchmarks.harness', os.path.join(REPO, page),
+               '--interactions', json.dumps(INTERACTIONS[page]), '--repeat', str(repeat)]
+    process = subprocess.run(command, cwd=workdir, env=env, capture_output=True, text=True)
+    for line in process.stdout.splitlines():
+        if line.startswith('BENCHMARK '):
+            return json.loads(line[len('BENCHMARK '):])
+    raise RuntimeError(f'{page} faalde:\n{process.stderr[-3000:]}')
+
+
+def run(scales, pages, repeat):
+    results = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as workdir:
+            started = time.perf_counter()
+            rows = write_datasets(workdir, scale)
+            print(f'schaal {scale}: {rows} in {time.perf_counter() - started:.1f}s', file=sys.stderr)
+            for page in pages:
+                for phase in ('cold', 'warm'):
+                    if phase == 'cold':
+                        shutil.rmtree(os.path.join(workdir, 'data', '.cache'), ignore_errors=True)
+                    measured = run_page(workdir, page, repeat)
+                    for result in measured['runs']:
+                        # De reruns zijn in beide fases gelijk, die worden alleen in de warme fase bewaard
+                        if phase == 'cold' and result['interaction'] != 'load':
+                            continue
+                        results.append({'scale': scale, 'rows': rows, 'page': page, 'phase': phase,
+                                        'peak_rss_mb': measured['peak_rss_mb'], **result})
+                    print(f"  {page} {phase}: load {measured['runs'][0]['seconds']:.2f}s, "
+                          f"{measured['peak_rss_mb']:.0f} MB", file=sys.stderr)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _key(result):
+    return result['scale'], result['page'], result['phase'], result['interaction']
+
+
+def compare(old_path, new_path):
+    # Verhouding nieuw / oud per meting; < 1 is sneller of kleiner
+    with open(old_path) as file:
+        old = {_key(result): result for result in json.load(file)['results']}
+    with open(new_path) as file:
+        new = json.load(file)['results']
+    print(f"{'schaal':>6}  {'pagina':<34} {'fase':<5} {'interactie':<16} {'tijd':>7} {'payload':>8} {'rss':>6}")
+    for result in new:
+        before = old.get(_key(result))
+        if before is None:
+            continue
+        ratios = [result[key] / before[key] if before[key] else float('nan')
+                  for key in ('seconds', 'payload_bytes', 'peak_rss_mb')]
+        print(f"{result['scale']:>6}  {result['page']:<34} {result['phase']:<5} {result['interaction']:<16} "
+              + ' '.join(f'{ratio:>7.2f}x' for ratio in ratios))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark van de pagina's van het dashboard")
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--pages', nargs='+', default=list(INTERACTIONS), choices=list(INTERACTIONS))
+    parser.add_argument('--repeat', type=int, default=3, help='aantal reruns per interactie')
+    parser.add_argument('--output', help=f'standaard {RESULTS_DIR}/<commit>.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OUD', 'NIEUW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit()
+
+    commit = git_commit()
+    document = {
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run([int(scale) if scale == int(scale) else scale for scale in args.scales], args.pages, args.repeat),
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(document, file, indent=1)
+    print(output)
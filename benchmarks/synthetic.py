@@ -0,0 +1,116 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetische datasets met dezelfde kolommen als data/laadpaaldata.csv, data/laadpalen.csv en
+# data/car_data.csv. Op schaal 1 hebben ze ongeveer de omvang van de echte bestanden.
+BASE_ROWS = {
+    'laadpaaldata': 10_000,
+    'laadpalen': 10_000,
+    'car_data': 20_000,
+}
+
+PROVINCIES = ['Groningen', 'Friesland', 'Drenthe', 'Overijssel', 'Flevoland', 'Gelderland', 'Utrecht',
+              'Noord-Holland', 'Zuid-Holland', 'Zeeland', 'Noord-Brabant', 'Limburg']
+MERKEN = ['TESLA', 'VOLKSWAGEN', 'KIA', 'HYUNDAI', 'BMW', 'RENAULT', 'PEUGEOT', 'AUDI', 'VOLVO', 'NISSAN',
+          'SKODA', 'POLESTAR', 'MERCEDES-BENZ', 'FORD', 'OPEL']
+KLEUREN = ['ROOD', 'BLAUW', 'GROEN', 'WIT', 'ZWART', 'GRIJS', 'ORANJE', 'PAARS', 'BRUIN', 'GEEL', 'BEIGE']
+
+
+def laadpaaldata(n, rng):
+    started = np.datetime64('2018-01-01T00:00:00') + np.sort(rng.integers(0, 365 * 86400, n)).astype('timedelta64[s]')
+    connected = rng.gamma(1.5, 4, n).round(4)
+    ended = started + (connected * 3600).astype('timedelta64[s]')
+    charge = (connected * rng.uniform(0.1, 1, n)).round(4)
+    return pd.DataFrame({
+        'Started': pd.Series(started).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'Ended': pd.Series(ended).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'TotalEnergy': (charge * rng.uniform(2000, 11000, n)).astype(int),
+        'ConnectedTime': connected,
+        'ChargeTime': charge,
+        'MaxPower': rng.integers(1000, 22000, n),
+    })
+
+
+def laadpalen(n, rng):
+    dates = pd.Timestamp('2012-01-01') + pd.to_timedelta(rng.integers(0, 4300, n), 'D')
+    flag = lambda: rng.choice(['True', 'False', ''], n, p=[.6, .35, .05])
+    # Coordinaten rond een paar steden, zodat er net als in het echt clusters zijn
+    centers = np.array([[52.37, 4.90], [51.92, 4.48], [52.09, 5.12], [51.44, 5.47], [53.22, 6.57], [52.08, 4.30]])
+    center = centers[rng.integers(0, len(centers), n)]
+    spread = rng.choice([0.05, 0.6], n, p=[.7, .3])
+    lat = np.clip(center[:, 0] + rng.normal(0, 1, n) * spread, 50.8, 53.5).round(6)
+    lon = np.clip(center[:, 1] + rng.normal(0, 1, n) * spread, 3.4, 7.2).round(6)
+    return pd.DataFrame({
+        'ID': np.arange(1, n + 1),
+        'OperatorID': rng.integers(1, 50, n).astype(float),
+        'UsageTypeID': rng.integers(1, 6, n),
+        'UsageCost': rng.choice(['€0,30/kWh', 'free', None], n),
+        'Connections': [f"[{{'ID': {i}}}]" for i in range(n)],
+        'NumberOfPoints': rng.integers(1, 4, n),
+        'DateCreated': dates.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'OperatorInfo.Title': rng.choice(['Allego', 'Vattenfall', 'Shell Recharge', 'Eneco'], n),
+        'OperatorInfo.IsPrivateIndividual': flag(),
+        'OperatorInfo.IsRestrictedEdit': flag(),
+        'UsageType.IsPayAtLocation': flag(),
+        'UsageType.IsMembershipRequired': flag(),
+        'UsageType.IsAccessKeyRequired': flag(),
+        'UsageType.ID': rng.integers(1, 6, n),
+        'UsageType.Title': rng.choice(['Public', 'Private', 'Public - Membership Required'], n),
+        'StatusType.IsOperational': flag(),
+        'AddressInfo.AddressLine1': [f'Straat {i}' for i in range(n)],
+        'AddressInfo.Town': rng.choice(['Amsterdam', 'Utrecht', 'Rotterdam', 'Den Haag', 'Eindhoven', 'Groningen'], n),
+        'AddressInfo.StateOrProvince': rng.choice(PROVINCIES, n),
+        'AddressInfo.Latitude': lat,
+        'AddressInfo.Longitude': lon,
+        'Connection.ConnectionType.IsDiscontinued': flag(),
+        'Connection.ConnectionType.IsObsolete': flag(),
+        'Connection.StatusType.IsOperational': flag(),
+        'Connection.StatusType.IsUserSelectable': flag(),
+        'Connection.Level.IsFastChargeCapable': flag(),
+        'Connection.Level.Title': rng.choice(['Level 2 : Medium (Over 2kW)', 'Level 3:  High (Over 40kW)'], n),
+        'Connection.PowerKW': rng.choice([11, 22, 50, 150, np.nan], n),
+        'Year': dates.year,
+    })
+
+
+def car_data(n, rng):
+    merk = rng.choice(MERKEN, n)
+    registered = pd.Timestamp('2018-01-01') + pd.to_timedelta(rng.integers(0, 2000, n), 'D')
+    first = registered - pd.to_timedelta(rng.integers(0, 800, n), 'D')
+    return pd.DataFrame({
+        'Kenteken': [f'K{i:07d}' for i in range(n)],
+        'Merk': merk,
+        'Handelsbenaming': pd.Series(merk) + ' MODEL ' + pd.Series(rng.integers(1, 8, n)).astype(str),
+        'Eerste kleur': rng.choice(KLEUREN, n),
+        'Catalogusprijs': rng.lognormal(10.8, 0.4, n).round(),
+        'Aantal zitplaatsen': rng.choice([2, 4, 5, 7, np.nan], n),
+        'Lengte': rng.integers(350, 520, n),
+        'Breedte': rng.integers(160, 210, n),
+        'Vermogen massarijklaar': rng.uniform(0.05, 0.3, n).round(2),
+        'Datum tenaamstelling DT': registered.strftime('%m/%d/%Y %I:%M:%S %p'),
+        'Datum eerste tenaamstelling in Nederland DT': first.strftime('%m/%d/%Y %I:%M:%S %p'),
+    })
+
+
+GENERATORS = {'laadpaaldata': laadpaaldata, 'laadpalen': laadpalen, 'car_data': car_data}
+
+
+def write_datasets(directory, scale=1, seed=0):
+    '''
+    Schrijf de drie CSV bestanden op schaal `scale` naar directory/data, samen met de echte
+    provinciegrenzen. Geeft het aantal rijen per dataset terug.
+    '''
+    data_dir = os.path.join(directory, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    shutil.copy(os.path.join(REPO, 'data', 'provincies.json'), data_dir)
+    rows = {}
+    for name, generate in GENERATORS.items():
+        rng = np.random.default_rng(seed)
+        rows[name] = int(BASE_ROWS[name] * scale)
+        generate(rows[name], rng).to_csv(os.path.join(data_dir, f'{name}.csv'), index=False)
+    return rows
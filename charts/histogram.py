@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+# Histogrammen die op de server worden gebind: naar de browser gaan alleen de bins en de aantallen
+# (een Bar trace), niet alle rijen zoals bij go.Histogram/px.histogram. De grootte van de grafiek
+# hangt daardoor niet meer af van het aantal rijen.
+
+# Maximaal aantal bins bij automatische binning, zoals de standaard van Plotly
+MAX_BINS = 100
+
+
+def nice_width(raw_width):
+    # De kleinste breedte 1, 2 of 5 x 10^k die minstens raw_width is, zodat de bins op ronde getallen vallen
+    if not raw_width > 0:
+        return 1.0
+    magnitude = 10 ** np.floor(np.log10(raw_width))
+    for step in (1, 2, 5, 10):
+        if step * magnitude >= raw_width:
+            return float(step * magnitude)
+
+
+def numeric_bins(values, bins=None):
+    '''
+    Tel de waardes (zonder NaN) in bins van gelijke breedte. Zonder bins wordt het aantal gekozen met
+    numpy's 'auto' regel (het maximum van Sturges en Freedman-Diaconis), afgerond naar een ronde
+    binbreedte. Geeft een dict met counts (int64) en edges (len(counts) + 1) terug.
+    '''
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {'counts': np.zeros(0, np.int64), 'edges': np.zeros(1)}
+    low, high = values.min(), values.max()
+    if bins is None:
+        raw_bins = len(np.histogram_bin_edges(values, bins='auto')) - 1
+        width = nice_width(max((high - low) / min(raw_bins, MAX_BINS), 0))
+        start = np.floor(low / width) * width
+        # Een extra bin als de hoogste waarde precies op de laatste rand valt
+        n_bins = int(np.floor((high - start) / width)) + 1
+        edges = start + width * np.arange(n_bins + 1)
+    else:
+        edges = np.histogram_bin_edges(values, bins=bins)
+    counts, edges = np.histogram(values, bins=edges)
+    return {'counts': counts.astype(np.int64), 'edges': edges}
+
+
+def category_counts(values):
+    '''
+    Aantal per waarde (zonder ontbrekende waardes), in volgorde van eerste voorkomen zoals Plotly de
+    categorieen van een histogram ordent.
+    '''
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return pd.Series(counts, index=pd.Index(uniques, name=getattr(values, 'name', None)), dtype=np.int64)
+
+
+def numeric_trace(histogram, histnorm=None, **kwargs):
+    # Een Bar per bin, midden op de bin en zo breed als de bin
+    counts, edges = histogram['counts'], histogram['edges']
+    return go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=_normalize(counts, histnorm), width=np.diff(edges), **kwargs)
+
+
+def category_trace(counts, histnorm=None, **kwargs):
+    return go.Bar(x=list(counts.index), y=_normalize(counts.to_numpy(), histnorm), **kwargs)
+
+
+def _normalize(counts, histnorm):
+    if histnorm is None:
+        return counts
+    total = counts.sum()
+    if histnorm == 'percent':
+        return 100 * counts / total if total else counts * 0.0
+    if histnorm == 'probability':
+        return counts / total if total else counts * 0.0
+    raise ValueError(f"histnorm moet None, 'percent' of 'probability' zijn, niet {histnorm!r}")
+
+
+def histogram_figure(histogram, x, histnorm=None, **kwargs):
+    '''
+    Een figuur met één server-side gebind histogram, met dezelfde opmaak als px.histogram(data, x=x):
+    aansluitende bars en 'count' (of de normalisatie) op de y-as.
+    '''
+    figure = go.Figure(numeric_trace(histogram, histnorm, **kwargs))
+    figure.update_layout(bargap=0, xaxis_title=x, yaxis_title=histnorm or 'count')
+    return figure
@@ -0,0 +1,141 @@
+import json
+
+import numpy as np
+from branca.colormap import linear
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+# Maximaal aantal markers dat naar de browser wordt gestuurd. Boven dit aantal worden laadpalen
+# eerst op de server in een grid samengevoegd, zodat de HTML payload begrensd blijft.
+MARKER_BUDGET = 10_000
+
+# Groottes (afstand van het midden tot een hoek, in km) van de hexagonen in de dichtheidslaag
+HEX_SIZES_KM = (2, 5, 10, 25)
+# De hexagonen liggen in een equirectangulaire projectie rond deze breedtegraad: op de schaal van
+# Nederland zijn ze daarin (bijna) regelmatig, verder naar het noorden of zuiden worden ze iets platter
+HEX_REFERENCE_LAT = 52.2
+_KM_PER_DEGREE_LAT = 110.574
+_KM_PER_DEGREE_LON = 111.320 * np.cos(np.radians(HEX_REFERENCE_LAT))
+
+# Javascript callback voor FastMarkerCluster. Elke rij is [lat, lon, label index, aantal];
+# de labels staan maar één keer in de payload in plaats van bij elke marker.
+_MARKER_CALLBACK = '''
+var labels = %s;
+var callback = function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'bolt', prefix: 'fa', markerColor: 'green', iconColor: 'white'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    var popup = document.createElement('div');
+    popup.textContent = row[3] > 1 ? row[3] + ' laadpalen' : (labels[row[2]] || '');
+    marker.bindPopup(popup);
+    return marker;
+};
+'''
+
+
+def grid_cluster(lat, lon, codes, budget=MARKER_BUDGET, cell=0.005):
+    '''
+    Voeg punten samen in een grid van cell graden, en verdubbel de celgrootte totdat er niet
+    meer dan budget cellen over zijn. Geeft per cel het gemiddelde punt, een label en het aantal.
+    '''
+    counts = np.ones(len(lat), dtype=np.int64)
+    while len(lat) > budget:
+        rows = np.floor(lat / cell).astype(np.int64)
+        cols = np.floor(lon / cell).astype(np.int64)
+        _, inverse, counts = np.unique(rows * 1_000_003 + cols, return_inverse=True, return_counts=True)
+        if len(counts) <= budget:
+            lat = np.bincount(inverse, weights=lat) / counts
+            lon = np.bincount(inverse, weights=lon) / counts
+            # Het label van een cel is dat van het eerste punt in de cel
+            first = np.full(len(counts), len(codes))
+            np.minimum.at(first, inverse, np.arange(len(codes)))
+            codes = codes[first]
+            break
+        cell *= 2
+    return lat, lon, codes, counts
+
+
+def marker_cluster(lat, lon, codes, labels, budget=MARKER_BUDGET):
+    '''
+    Maak een FastMarkerCluster laag uit coordinaat arrays. De markers worden in de browser
+    aangemaakt en geclusterd; lat/lon worden afgerond op 5 decimalen (~1 meter).
+    '''
+    lat, lon, codes, counts = grid_cluster(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float),
+                                           np.asarray(codes), budget)
+    data = list(zip(np.round(lat, 5).tolist(), np.round(lon, 5).tolist(), codes.tolist(), counts.tolist()))
+    callback = _MARKER_CALLBACK % json.dumps([str(label) for label in labels])
+    return FastMarkerCluster(data, callback=callback)
+
+
+def hex_cells(lat, lon, size_km):
+    '''
+    Axiale coordinaten (q, r) van de hexagoon (punt naar boven) waarin elk punt valt, voor alle
+    punten tegelijk: de fractionele coordinaten worden afgerond in kubus-coordinaten.
+    '''
+    x = np.asarray(lon, dtype=float) * _KM_PER_DEGREE_LON / size_km
+    y = np.asarray(lat, dtype=float) * _KM_PER_DEGREE_LAT / size_km
+    q = np.sqrt(3) / 3 * x - y / 3
+    r = 2 / 3 * y
+    s = -q - r
+    rq, rr, rs = np.round(q), np.round(r), np.round(s)
+    dq, dr, ds = np.abs(rq - q), np.abs(rr - r), np.abs(rs - s)
+    # De coordinaat met de grootste afrondfout volgt uit de andere twee (q + r + s = 0)
+    fix_q = (dq > dr) & (dq > ds)
+    fix_r = ~fix_q & (dr > ds)
+    rq = np.where(fix_q, -rr - rs, rq)
+    rr = np.where(fix_r, -rq - rs, rr)
+    return rq.astype(np.int64), rr.astype(np.int64)
+
+
+class _HexLayer(MacroElement):
+    # De hexagonen worden in de browser gemaakt, met dezelfde projectie als hex_cells. Elke rij is
+    # [q, r, kleurklasse, aantal], zodat de payload per hexagoon een paar getallen is in plaats van
+    # zeven coordinaten in GeoJSON.
+    _template = Template('''
+        {% macro script(this, kwargs) %}
+        (function () {
+            var cells = {{ this.cells }};
+            var colors = {{ this.colors }};
+            var size = {{ this.size_km }}, kmPerLon = {{ this.km_per_lon }}, kmPerLat = {{ this.km_per_lat }};
+            var renderer = L.canvas();
+            var layer = L.featureGroup();
+            cells.forEach(function (cell) {
+                var x = size * Math.sqrt(3) * (cell[0] + cell[1] / 2), y = size * 1.5 * cell[1];
+                var corners = [];
+                for (var i = 0; i < 6; i++) {
+                    var angle = Math.PI / 180 * (60 * i - 30);
+                    corners.push([(y + size * Math.sin(angle)) / kmPerLat, (x + size * Math.cos(angle)) / kmPerLon]);
+                }
+                L.polygon(corners, {renderer: renderer, fillColor: colors[cell[2]], fillOpacity: 0.7, weight: 0})
+                    .bindTooltip(cell[3] + ' laadpalen').addTo(layer);
+            });
+            layer.addTo({{ this._parent.get_name() }});
+        })();
+        {% endmacro %}
+    ''')
+
+    def __init__(self, cells, colors, size_km):
+        super().__init__()
+        self._name = 'HexLayer'
+        self.cells = json.dumps(cells, separators=(',', ':'))
+        self.colors = json.dumps(colors)
+        self.size_km = size_km
+        self.km_per_lon = float(_KM_PER_DEGREE_LON)
+        self.km_per_lat = _KM_PER_DEGREE_LAT
+
+
+def hex_layer(q, r, counts, size_km, caption='Aantal laadpalen per hexagoon'):
+    '''
+    Een laag met een hexagoon per (niet-lege) cel. De kleuren zijn klassen op de kwantielen van de
+    aantallen. Geeft de laag en de legenda (een branca colormap) terug.
+    '''
+    counts = np.asarray(counts, dtype=np.int64)
+    bounds = np.unique(np.quantile(counts, [0, .5, .75, .9, .97, 1])) if len(counts) else np.array([0])
+    if len(bounds) < 2:
+        bounds = np.array([bounds[0], bounds[0] + 1])
+    colormap = linear.YlOrRd_09.scale(bounds[0], bounds[-1]).to_step(index=bounds.tolist())
+    colormap.caption = caption
+    classes = np.clip(np.searchsorted(bounds, counts, side='right') - 1, 0, len(bounds) - 2)
+    cells = np.column_stack([np.asarray(q, dtype=np.int64), np.asarray(r, dtype=np.int64), classes, counts])
+    layer = _HexLayer(cells.tolist(), [colormap(bound) for bound in bounds[:-1]], size_km)
+    return layer, colormap
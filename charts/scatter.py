@@ -0,0 +1,115 @@
+import numpy as np
+import plotly.express as px
+
+# Maximaal aantal punten dat een scatter plot naar de browser stuurt
+POINT_BUDGET = 5000
+# Boven dit aantal punten wordt een WebGL (Scattergl) trace gebruikt in plaats van SVG
+WEBGL_THRESHOLD = 1000
+
+
+def lttb(x, y, n_out):
+    '''
+    Largest-Triangle-Three-Buckets: kies n_out indices uit een tijdreeks (x oplopend gesorteerd) zodat
+    de vorm van de lijn behouden blijft. Per bucket wordt het punt gekozen dat de grootste driehoek
+    maakt met het vorige gekozen punt en het gemiddelde van de volgende bucket.
+    '''
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.nanargmax(area)) if end > start else start
+        selected[i + 1] = previous
+    return np.unique(selected)
+
+
+def grid_sample(x, y, n_out, bins=100, seed=0):
+    '''
+    Dichtheid-behoudende steekproef voor 2D puntenwolken: de punten worden in een bins x bins grid
+    verdeeld en uit elke cel wordt een aandeel getrokken dat evenredig is met het aantal punten in die
+    cel (minimaal één, zodat uitschieters zichtbaar blijven).
+    '''
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # Een grover grid als er meer bezette cellen zijn dan de helft van het budget
+    while True:
+        cells = _bin(x, bins) * bins + _bin(y, bins)
+        if bins <= 2 or len(np.unique(cells)) <= n_out // 2:
+            break
+        bins //= 2
+
+    # Willekeurige volgorde binnen elke cel, en de rang van elk punt binnen zijn cel
+    order = np.random.default_rng(seed).permutation(n)
+    order = order[np.argsort(cells[order], kind='stable')]
+    sorted_cells = cells[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    rank = np.arange(n) - np.repeat(starts, counts)
+
+    # Zoek de grootste fractie waarbij het totaal (met minimaal één punt per cel) binnen het budget blijft
+    low, high = 0.0, n_out / n
+    for _ in range(30):
+        ratio = (low + high) / 2
+        if np.maximum(1, np.floor(counts * ratio)).sum() <= n_out:
+            low = ratio
+        else:
+            high = ratio
+    quota = np.maximum(1, np.floor(counts * low)).astype(np.int64)
+    keep = rank < np.repeat(quota, counts)
+    return np.sort(order[keep])
+
+
+def _bin(values, bins):
+    finite = np.isfinite(values)
+    if not finite.any():
+        return np.zeros(len(values), dtype=np.int64)
+    low, high = values[finite].min(), values[finite].max()
+    scaled = (values - low) / (high - low or 1) * (bins - 1)
+    return np.nan_to_num(scaled, nan=bins).astype(np.int64)
+
+
+def downsample(data, x, y, mode='grid', max_points=POINT_BUDGET):
+    '''
+    Hooguit max_points rijen van data: mode='lttb' voor tijdreeksen (x wordt gesorteerd), mode='grid'
+    voor 2D puntenwolken. Geeft de rijen en het aantal weggelaten rijen terug.
+    '''
+    if len(data) <= max_points:
+        return data, 0
+    if mode == 'lttb':
+        data = data.sort_values(x)
+        index = lttb(_numeric(data[x]), _numeric(data[y]), max_points)
+    else:
+        index = grid_sample(_numeric(data[x]), _numeric(data[y]), max_points)
+    return data.iloc[index], len(data) - len(index)
+
+
+def scatter(data, x, y, mode='grid', max_points=POINT_BUDGET, **kwargs):
+    '''
+    px.scatter met een begrensd aantal punten (zie downsample). Geeft de figuur en het aantal
+    weggelaten punten terug.
+    '''
+    data, dropped = downsample(data, x, y, mode, max_points)
+    render_mode = 'webgl' if len(data) > WEBGL_THRESHOLD else 'svg'
+    fig = px.scatter(data, x=x, y=y, render_mode=render_mode, **kwargs)
+    return fig, dropped
+
+
+def _numeric(series):
+    # Datums worden als nanoseconden meegenomen in de berekening
+    if np.issubdtype(series.dtype, np.datetime64):
+        return series.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(float)
+    return series.to_numpy(dtype=float, na_value=np.nan)
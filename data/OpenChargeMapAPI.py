@@ -1,38 +1,71 @@
-import pandas as pd
-import numpy as np
-import requests
+import os
 
-import streamlit as st
+from data import provincies
+from data.cache import load_cached
+from data.schema import DATETIME, apply_schema, read_csv_typed
 
 # Request de data en sla de response op in een variabele 
 
+SOURCE = "data/laadpalen.csv"
+# Verhoog deze versie bij elke wijziging in dataclean, zodat de Parquet cache opnieuw wordt opgebouwd
+DATACLEAN_VERSION = 4
 
-@st.cache_data  # Cache the data to speed up app performance
-def load_data():
-    data = pd.read_csv("data/laadpalen.csv")
-    filtered_data = dataclean(data)
-    return filtered_data
-
-def dataclean(data):
-
-    # Convert to right datatypes
-    objects = [
+# Schema dat tijdens het inlezen wordt toegepast: nullable booleans voor de vlaggen,
+# categoricals voor tekst met weinig unieke waardes en kleinere numerieke types
+FLAGS = [
     'OperatorInfo.IsPrivateIndividual',
     'OperatorInfo.IsRestrictedEdit',
     'UsageType.IsPayAtLocation',
     'UsageType.IsMembershipRequired',
     'UsageType.IsAccessKeyRequired',
+    'StatusType.IsOperational',
     'Connection.ConnectionType.IsDiscontinued',
     'Connection.ConnectionType.IsObsolete',
     'Connection.StatusType.IsOperational',
     'Connection.StatusType.IsUserSelectable',
     'Connection.Level.IsFastChargeCapable',
-    ]
-    for obj in objects:
-        data[obj] = data[obj].astype('bool')
+]
+SCHEMA = {
+    **{flag: 'boolean' for flag in FLAGS},
+    'ID': 'int32',
+    'OperatorID': 'float32',
+    'UsageTypeID': 'float32',
+    'UsageType.ID': 'float32',
+    'NumberOfPoints': 'float32',
+    'Connection.PowerKW': 'float32',
+    # Coordinaten blijven float64, float32 is op deze schaal maar ~1 meter nauwkeurig
+    'AddressInfo.Latitude': 'float64',
+    'AddressInfo.Longitude': 'float64',
+    'Year': 'Int16',
+    'DateCreated': DATETIME,
+    'OperatorInfo.Title': 'category',
+    'UsageType.Title': 'category',
+    'AddressInfo.Town': 'category',
+    'AddressInfo.StateOrProvince': 'category',
+    'Connection.Level.Title': 'category',
+    'Provincie': 'category',
+}
+
+
+# In het geheugen wordt de dataset gedeeld via data.registry.laadpalen()
+def load_data():
+    # Gebruik de SQLite store van de incrementele import (data/ocm_ingest.py) als die bestaat
+    from data import ocm_ingest
+    if os.path.exists(ocm_ingest.STORE):
+        source, read = ocm_ingest.STORE, ocm_ingest.read_store
+    else:
+        source, read = SOURCE, lambda: read_csv_typed(SOURCE, SCHEMA)
+
+    # De provinciegrenzen zijn ook een bron: als die veranderen moet de Provincie kolom opnieuw
+    return load_cached('laadpalen', [source, provincies.SOURCE], DATACLEAN_VERSION,
+                       lambda: dataclean(read()))
+
+def dataclean(data):
 
-    return data
+    # Convert to right datatypes (bij read_csv_typed gebeurt dit al tijdens het inlezen)
+    data = apply_schema(data, SCHEMA)
 
+    # Wijs elke laadpaal zelf toe aan een provincie met een spatial join op de provinciegrenzen
+    from data import registry
+    return provincies.assign_provincie(data, registry.provincies())
 
-# Load the data
-export = realTimeLaadPalenData = load_data()
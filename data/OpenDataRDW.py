@@ -1,19 +1,205 @@
+import os
+
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import streamlit as st
 
+from data.cache import fingerprint, load_cached
+from data.schema import DATETIME, parse_dates, read_csv_typed, split_schema
+
+SOURCE = "data/car_data.csv"
+# Verhoog deze versie bij elke wijziging in dataclean, zodat de Parquet cache opnieuw wordt opgebouwd
+DATACLEAN_VERSION = 2
+
+# De datums in de RDW export, bijvoorbeeld 04/27/2023 12:00:00 AM
+RDW_DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+# Schema dat tijdens het inlezen wordt toegepast. Merk, model en kleur hebben weinig unieke waardes
+# en worden daarom als categorical opgeslagen in plaats van als losse Python strings
+SCHEMA = {
+    'Merk': 'category',
+    'Handelsbenaming': 'category',
+    'Eerste kleur': 'category',
+    'Catalogusprijs': 'float32',
+    'Aantal zitplaatsen': 'float32',
+    'Lengte': 'float32',
+    'Breedte': 'float32',
+    'Vermogen massarijklaar': 'float32',
+    'Datum tenaamstelling DT': (DATETIME, RDW_DATE_FORMAT),
+    'Datum eerste tenaamstelling in Nederland DT': (DATETIME, RDW_DATE_FORMAT),
+}
+# Kolommen die de streaming modus naast merk/model/kleur/prijs inleest (maanden en het prijsmodel)
+STREAM_COLUMNS = ['Aantal zitplaatsen', 'Lengte', 'Breedte', 'Vermogen massarijklaar',
+                  'Datum tenaamstelling DT', 'Datum eerste tenaamstelling in Nederland DT']
+
+
+# Streaming modus voor RDW exports die niet in het geheugen passen: de CSV wordt in chunks gelezen en
+# alleen de tellingen en prijssommen worden bewaard. RDW_STREAMING=1 forceert de modus, RDW_STREAMING=0
+# zet hem uit; anders wordt hij gebruikt voor bestanden groter dan STREAMING_THRESHOLD.
+STREAMING_THRESHOLD = 1024**3
+CHUNK_SIZE = 250_000
+# Aantal rijen dat in de streaming modus als steekproef wordt bewaard (o.a. voor het prijsmodel)
+SAMPLE_SIZE = 200_000
+PRICE_LIMIT = 200000
+# De aggregaten van stream_data per versie van de steekproef, voor load_aggregates
+_streamed_aggregates = {}
+
+
+def streaming_enabled(path=SOURCE):
+    setting = os.getenv('RDW_STREAMING')
+    if setting is not None:
+        return setting == '1'
+    return os.path.getsize(path) > STREAMING_THRESHOLD
 
-@st.cache_data  # Cache the data to speed up app performance
+
+# In het geheugen wordt de dataset gedeeld via data.registry.rdw()
 def load_data():
-    data = pd.read_csv("data/car_data.csv")
-    filtered_data = dataclean(data)
-    return filtered_data
+    if streaming_enabled():
+        return stream_data()[1]
+    return load_cached('car_data', [SOURCE], DATACLEAN_VERSION,
+                       lambda: dataclean(read_csv_typed(SOURCE, SCHEMA)))
+
+
+def load_aggregates(data):
+    '''
+    De tellingen en prijssommen per merk van de dataset data (bijvoorbeeld registry.rdw()), in beide
+    modi met dezelfde structuur. Voor de steekproef uit de streaming modus zijn dat de aggregaten van
+    de hele export waar hij uit komt.
+    '''
+    version = data.attrs.get('version', '')
+    if version in _streamed_aggregates:
+        return _streamed_aggregates[version]
+    return _frame_aggregates(data, version)
+
+
+@st.cache_data(show_spinner="🏃 Loading...")
+def _frame_aggregates(_data, version):
+    return aggregate(_data)
+
+
+def brand_aggregates(aggregates):
+    '''
+    Herschik de aggregaten per merk, zodat elke grafiek op pagina 4 een opzoeking is:
+      brands         - aantal auto's per merk, aflopend
+      average_price  - gemiddelde catalogusprijs over alle merken
+      by_brand[merk] - models en colors (aantallen, aflopend), price_sum, price_count en average_price
+    '''
+    models = aggregates['models'].sort_values(ascending=False, kind='stable')
+    colors = aggregates['colors'].sort_values(ascending=False, kind='stable')
+    # Na het sorteren blijft de volgorde per merk behouden bij het opsplitsen
+    models_by_brand = dict(iter(models.groupby(level='Merk', sort=False)))
+    colors_by_brand = dict(iter(colors.groupby(level='Merk', sort=False)))
+    empty = pd.Series(dtype='int64')
+    by_brand = {}
+    for brand in aggregates['brands'].index:
+        price_sum = float(aggregates['price_sum'].get(brand, 0.0))
+        price_count = int(aggregates['price_count'].get(brand, 0))
+        by_brand[brand] = {
+            'models': models_by_brand[brand].droplevel('Merk') if brand in models_by_brand else empty,
+            'colors': colors_by_brand[brand].droplevel('Merk') if brand in colors_by_brand else empty,
+            'price_sum': price_sum,
+            'price_count': price_count,
+            'average_price': price_sum / price_count if price_count else float('nan'),
+        }
+    return {
+        'brands': aggregates['brands'].sort_values(ascending=False, kind='stable'),
+        'average_price': aggregates['price_sum'].sum() / aggregates['price_count'].sum(),
+        'by_brand': by_brand,
+    }
 
 
 def dataclean(data: pd.DataFrame) -> pd.DataFrame:
     # Filter out cars with 'Catalogusprijs' above 200,000
-    data = data[data['Catalogusprijs'] <= 200000]
+    data = data[data['Catalogusprijs'] <= PRICE_LIMIT].copy()
+    # Verwijder de merken/modellen/kleuren die na het filter niet meer voorkomen
+    for column in data.select_dtypes('category').columns:
+        data[column] = data[column].cat.remove_unused_categories()
     return data
 
 
-# Load the data
-export = rdw_data = load_data()
+def aggregate(data):
+    '''
+    Tellingen en prijssommen van één (deel van de) dataset. Het resultaat van meerdere chunks kan met
+    merge_aggregates worden samengevoegd; gemiddelde prijzen zijn dan price_sum / price_count.
+    '''
+    data = data[data['Catalogusprijs'] <= PRICE_LIMIT]
+    # Eén groupby over merk, model en kleur; de tellingen per merk, model en kleur zijn sommen daarvan.
+    # Sommeer in float64, zodat de prijssom over miljoenen rijen niet afrondt zoals in float32
+    price = data['Catalogusprijs'].astype('float64')
+    cube = price.groupby([data['Merk'], data['Handelsbenaming'], data['Eerste kleur']],
+                         observed=True, dropna=False).agg(['size', 'count', 'sum'])
+    aggregates = {
+        'brands': cube['size'].groupby(level='Merk', observed=True).sum(),
+        'models': cube['size'].groupby(level=['Merk', 'Handelsbenaming'], observed=True).sum(),
+        'colors': cube['size'].groupby(level=['Merk', 'Eerste kleur'], observed=True).sum(),
+        'price_sum': cube['sum'].groupby(level='Merk', observed=True).sum(),
+        'price_count': cube['count'].groupby(level='Merk', observed=True).sum(),
+    }
+    for column, key in [('Datum tenaamstelling DT', 'months'),
+                        ('Datum eerste tenaamstelling in Nederland DT', 'months_eerste')]:
+        if column in data.columns:
+            aggregates[key] = pd.to_datetime(data[column]).dt.month.value_counts()
+    return {key: _plain_index(series) for key, series in aggregates.items()}
+
+
+def merge_aggregates(total, part):
+    # Tel de aggregaten van een chunk op bij het totaal
+    if total is None:
+        return part
+    merged = {key: total[key].add(part[key], fill_value=0) for key in total}
+    return {key: series if key == 'price_sum' else series.astype('int64') for key, series in merged.items()}
+
+
+def _plain_index(series):
+    # Categorical indexen van verschillende chunks hebben andere categorieen, dus zet ze om naar gewone labels
+    index = series.index
+    if isinstance(index, pd.MultiIndex):
+        series.index = index.set_levels([level.astype(object) for level in index.levels])
+    else:
+        series.index = index.astype(object)
+    return series
+
+
+def _chunks(path, chunksize):
+    # Lees alleen de benodigde kolommen, in chunks; Parquet bestanden worden per batch gescand
+    columns = ['Merk', 'Handelsbenaming', 'Eerste kleur', 'Catalogusprijs', *STREAM_COLUMNS]
+    if path.endswith('.parquet'):
+        parquet = pq.ParquetFile(path)
+        columns = [column for column in columns if column in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    columns = [column for column in columns if column in header]
+    # De datums per chunk met het formaat uit het schema (zie data.schema.parse_dates)
+    dtypes, dates = split_schema(SCHEMA, columns)
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunksize):
+        yield parse_dates(chunk, dates)
+
+
+def stream_data(path=SOURCE, chunksize=CHUNK_SIZE, sample_size=SAMPLE_SIZE):
+    '''
+    Lees de RDW export in chunks. Per chunk wordt het prijsfilter toegepast en worden de aggregaten
+    bijgeteld, zodat het geheugengebruik begrensd blijft door de chunkgrootte. Daarnaast wordt een
+    willekeurige steekproef van sample_size rijen bewaard (bottom-k op een random sleutel). Een
+    gewijzigde export (grootte of mtime) wordt opnieuw gelezen.
+    '''
+    return _stream_data(path, chunksize, sample_size, fingerprint([path])[path])
+
+
+# cache_resource: de aggregaten en de steekproef worden gedeeld door alle sessies in plaats van per rerun
+# gekopieerd. De vingerafdruk van de export zit in de cache key; de vorige versie valt er daarna uit
+@st.cache_resource(show_spinner='RDW data streamen...', max_entries=2)
+def _stream_data(path, chunksize, sample_size, source):
+    rng = np.random.default_rng(42)
+    total, sample = None, None
+    for chunk in _chunks(path, chunksize):
+        total = merge_aggregates(total, aggregate(chunk))
+        chunk = chunk[chunk['Catalogusprijs'] <= PRICE_LIMIT].assign(_key=lambda c: rng.random(len(c)))
+        sample = chunk if sample is None else pd.concat([sample, chunk])
+        sample = sample.nsmallest(sample_size, '_key')
+
+    sample = dataclean(sample.drop(columns='_key').sort_index().reset_index(drop=True))
+    sample.attrs['version'] = f"car_data-stream-{DATACLEAN_VERSION}-{source['size']}-{source['mtime_ns']}"
+    _streamed_aggregates[sample.attrs['version']] = total
+    return total, sample
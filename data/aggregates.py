@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Aggregaties die de pagina's tonen. Elke functie krijgt de (gecachte) DataFrame als _data mee,
+# zodat Streamlit de hele DataFrame niet hoeft te hashen: de cache key is de versie van de dataset
+# (data.attrs['version'], gezet door data.cache.load_cached).
+
+# De provincie van laadpalen die in geen enkele provincie vallen (zie data.provincies)
+OUTSIDE_PROVINCES = 'Buiten de provincies'
+
+
+def dataset_version(data):
+    return data.attrs.get('version', '')
+
+
+def rdw_monthly_registrations(aggregates):
+    # Het aantal (eerste) tenaamstellingen per maand, uit de aggregaten van data.OpenDataRDW.load_aggregates
+    merged_counts = pd.DataFrame({
+        'Registrations_Tenaamstelling': aggregates['months'],
+        'Registrations_EersteTenaamstelling': aggregates['months_eerste'],
+    }).fillna(0).astype(int).sort_index()
+    merged_counts.index = merged_counts.index.astype(int)
+    return merged_counts.rename_axis('Month').reset_index()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def station_count_cube(_data, _geodata, version):
+    '''
+    Kubus provincie x jaar met het aantal nieuwe laadpaallocaties (count), het cumulatieve aantal
+    (cum_count) en het cumulatieve aantal per km2 (per_km2). Een locatie is uniek op de numerieke
+    (lat, lon) combinatie, dus er zijn geen string-sleutels per rij nodig.
+    '''
+    locations = _data[['Year', 'Provincie', 'AddressInfo.Latitude', 'AddressInfo.Longitude']].drop_duplicates()
+    counts = locations.groupby(['Provincie', 'Year'], observed=True).size().unstack('Year', fill_value=0)
+    counts.index = counts.index.astype(str)
+
+    # Vul jaren zonder nieuwe laadpalen aan, zodat de cumulatieve som voor elk jaar bestaat
+    years = counts.columns.astype(int)
+    counts = counts.reindex(columns=range(years.min(), years.max() + 1), fill_value=0)
+    cum_counts = counts.cumsum(axis=1)
+
+    area_km2 = _geodata.set_index('PROVINCIENAAM')['area_km2'].reindex(counts.index)
+    per_km2 = cum_counts.div(area_km2, axis=0)
+
+    cube = pd.concat({'count': counts.stack(), 'cum_count': cum_counts.stack(), 'per_km2': per_km2.stack()}, axis=1)
+    cube.index.names = ['Provincie', 'Year']
+    return cube.swaplevel().sort_index()
+
+
+def station_counts_for_year(cube, year):
+    # Alle provincies voor één jaar: een index lookup in de kubus
+    if year not in cube.index.get_level_values('Year'):
+        return pd.DataFrame(columns=['Provincie', 'count', 'cum_count', 'per_km2'])
+    return cube.xs(year, level='Year').reset_index()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def station_markers(_data, version):
+    # Compacte numpy arrays voor de markers op de kaart: coordinaten, jaar, provincie en label codes
+    provincie = _data['Provincie'].astype('category')
+    title = _data['Connection.Level.Title'].astype('category')
+    return {
+        'lat': _data['AddressInfo.Latitude'].to_numpy(dtype=float),
+        'lon': _data['AddressInfo.Longitude'].to_numpy(dtype=float),
+        'year': _data['Year'].fillna(0).to_numpy(dtype=int),
+        'provincie': provincie.cat.codes.to_numpy(),
+        'provincies': provincie.cat.categories.astype(str).tolist(),
+        'codes': title.cat.codes.to_numpy(),
+        'labels': title.cat.categories.astype(str).tolist(),
+    }
+
+
+def select_markers(markers, provincies, year, cumulative=False):
+    # Boolean masker over de marker arrays voor de geselecteerde provincies en het jaar
+    prov_codes = [i for i, name in enumerate(markers['provincies']) if name in provincies]
+    mask = np.isin(markers['provincie'], prov_codes)
+    mask &= (markers['year'] <= year) if cumulative else (markers['year'] == year)
+    # Laadpalen zonder coordinaten kunnen niet op de kaart
+    mask &= ~(np.isnan(markers['lat']) | np.isnan(markers['lon']))
+    return {key: markers[key][mask] for key in ('lat', 'lon', 'codes')}
+
+
+def select_hex_cells(hex_counts, size_km, provincies, year, cumulative=False):
+    # Aantal laadpalen per hexagoon van één grootte, voor de geselecteerde provincies en het jaar.
+    # Met provincies=None alle laadpalen, ook die buiten de provinciegrenzen (OUTSIDE_PROVINCES)
+    selection = hex_counts[hex_counts['size_km'] == size_km]
+    if provincies is not None:
+        selection = selection[selection['Provincie'].isin(provincies)]
+    years = selection['Year']
+    selection = selection[(years <= year) if cumulative else (years == year)]
+    return selection.groupby(['q', 'r'], sort=False)['count'].sum().reset_index()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+# Map waarin de opgeschoonde DataFrames als Parquet bestanden worden bewaard
+CACHE_DIR = 'data/.cache'
+
+logger = logging.getLogger(__name__)
+
+
+def file_hash(path, chunk_size=1 << 20):
+    # Bereken de sha256 hash van een bronbestand, in blokken zodat grote bestanden niet in het geheugen hoeven
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(sources):
+    # Goedkope vingerafdruk (grootte en mtime) van alle bronbestanden
+    fingerprints = {}
+    for source in sources:
+        stat = os.stat(source)
+        fingerprints[source] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return fingerprints
+
+
+def _is_valid(meta, sources, version):
+    # Controleer of de cache nog past bij de bronbestanden en de versie van dataclean. Geeft (valid,
+    # touched) terug; touched betekent dat alleen de mtime is veranderd en meta is bijgewerkt
+    if meta.get('version') != version or set(meta.get('sources', {})) != set(sources):
+        return False, False
+
+    current = fingerprint(sources)
+    touched = False
+    for source, stat in current.items():
+        cached = meta['sources'][source]
+        if cached['size'] != stat['size']:
+            return False, False
+        # Alleen als de mtime is veranderd hoeven we de (dure) hash te vergelijken
+        if cached['mtime_ns'] != stat['mtime_ns']:
+            if cached['sha256'] != file_hash(source):
+                return False, False
+            cached['mtime_ns'] = stat['mtime_ns']
+            touched = True
+    return True, touched
+
+
+def load_cached(name, sources, version, build):
+    '''
+    Lees een opgeschoonde DataFrame uit de Parquet cache, of bouw deze opnieuw met build().
+    De cache is ongeldig zodra een bronbestand verandert (grootte, mtime + sha256) of de
+    versie van de dataclean logica wordt opgehoogd.
+    '''
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    data_path = os.path.join(CACHE_DIR, f'{name}.parquet')
+    meta_path = os.path.join(CACHE_DIR, f'{name}.json')
+
+    meta = {}
+    if os.path.exists(meta_path) and os.path.exists(data_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        valid, touched = _is_valid(meta, sources, version)
+        if valid:
+            if touched:
+                _write_meta(meta_path, meta)
+            data = pd.read_parquet(data_path)
+            data.attrs['version'] = meta['key']
+            return data
+
+    data = build()
+
+    sources_meta = fingerprint(sources)
+    for source, stat in sources_meta.items():
+        stat['sha256'] = file_hash(source)
+    key = f"{name}-{version}-" + hashlib.sha256(
+        ''.join(stat['sha256'] for stat in sources_meta.values()).encode()).hexdigest()[:12]
+    meta = {'version': version, 'key': key, 'sources': sources_meta}
+
+    # Schrijf eerst naar een tijdelijk bestand, zodat een andere worker nooit een half bestand leest
+    # (per thread, de verversing van data/refresh.py kan tegelijk met een pagina schrijven)
+    tmp_path = data_path + f'.{os.getpid()}-{threading.get_ident()}.tmp'
+    try:
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, data_path)
+        _write_meta(meta_path, meta)
+    except (OSError, ValueError, TypeError) as e:
+        # Kolommen met gemengde types kunnen niet altijd als Parquet worden opgeslagen;
+        # de app werkt dan gewoon zonder cache verder
+        logger.warning('Cache voor %s niet opgeslagen: %s', name, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    data.attrs['version'] = key
+    return data
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + f'.{os.getpid()}-{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
@@ -1,13 +1,16 @@
 import pandas as pd
-import streamlit as st
 
+from data.cache import load_cached
 
-@st.cache_data  # Cache the data to speed up app performance
+SOURCE = 'data/laadpaaldata.csv'
+# Verhoog deze versie bij elke wijziging in dataclean, zodat de Parquet cache opnieuw wordt opgebouwd
+DATACLEAN_VERSION = 2
+
+
+# In het geheugen wordt de dataset gedeeld via data.registry.laadpaaldata()
 def load_data():
-    data = pd.read_csv(
-        'data/laadpaaldata.csv')
-    filtered_data = dataclean(data)
-    return filtered_data
+    return load_cached('laadpaaldata', [SOURCE], DATACLEAN_VERSION,
+                       lambda: dataclean(pd.read_csv(SOURCE)))
 
 
 def dataclean(data):
@@ -20,6 +23,8 @@ def dataclean(data):
     # Convert 'Started' and 'Ended' columns to datetime format
     data['Started'] = pd.to_datetime(data['Started'], errors='coerce')
     data['Ended'] = pd.to_datetime(data['Ended'], errors='coerce')
+    # Het uur waarop de sessie begon (voor de bezetting gedurende de dag)
+    data['Hour'] = data['Started'].dt.hour.astype('Int8')
     # Calculate the charging speed in kWh per hour
     data['Charging speed'] = (data['TotalEnergy in kwh'] / (((data['Ended'] - data['Started']).dt.total_seconds()) / 3600 ))
     # Calculate the efficiency of the charging session
@@ -32,7 +37,3 @@ def dataclean(data):
     data['ChargeTime_min'] = data['ChargeTime'] * 60
     # Display
     return data
-
-
-# Load the data
-export = laadpaal_data = load_data()
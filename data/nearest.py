@@ -0,0 +1,85 @@
+import numpy as np
+import streamlit as st
+
+# Zoeken naar laadpalen rond een punt (bijvoorbeeld een klik op de kaart) met een BallTree over de
+# coordinaten in radialen en de haversine afstand. De boom wordt één keer per versie van de dataset
+# gebouwd en gedeeld door alle sessies; een zoekvraag kost dan O(log n) in plaats van een afstand
+# tot elke laadpaal. Voor "alleen snelladers" is er een tweede boom, zodat ook de k dichtstbijzijnde
+# snelladers exact zijn (en niet de snelladers onder de k dichtstbijzijnde laadpalen).
+#
+#   index = nearest.station_index(views.get('station_search_data'))
+#   nearest.within_radius(index, 52.09, 5.12, radius_km=2)
+#   nearest.k_nearest(index, 52.09, 5.12, k=5, fast_only=True)
+
+EARTH_RADIUS_KM = 6371.0088
+FAST = 'Connection.Level.IsFastChargeCapable'
+
+
+def station_index(data):
+    # data: een laadpaal per rij met AddressInfo.Latitude/Longitude (de view station_search_data)
+    return _station_index(data, data.attrs.get('version', ''))
+
+
+# Eén boom per versie; na een verversing van de OCM data (data/refresh.py) vallen de oudste weg
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _station_index(_data, version):
+    from sklearn.neighbors import BallTree
+    stations = _data.reset_index(drop=True)
+    coordinates = np.radians(stations[['AddressInfo.Latitude', 'AddressInfo.Longitude']].to_numpy(dtype=float))
+    fast = np.flatnonzero(stations[FAST].fillna(False).to_numpy(dtype=bool))
+    return {
+        'stations': stations,
+        'tree': BallTree(coordinates, metric='haversine'),
+        # Posities van de snelladers in stations, en een boom over alleen die posities (None als er
+        # geen snelladers zijn: een BallTree kan niet leeg zijn)
+        'fast': fast,
+        'fast_tree': BallTree(coordinates[fast], metric='haversine') if len(fast) else None,
+    }
+
+
+def _tree(index, fast_only):
+    if fast_only:
+        return index['fast_tree'], index['fast']
+    return index['tree'], None
+
+
+def _empty(index, rows):
+    return _result(index, np.zeros(0, np.int64), np.zeros(0), rows)
+
+
+def _result(index, positions, distances, rows):
+    # De laadpalen op de gevonden posities met de afstand in km, van dichtbij naar ver
+    if rows is not None:
+        positions = rows[positions]
+    order = np.argsort(distances, kind='stable')
+    result = index['stations'].iloc[positions[order]].reset_index(drop=True)
+    result.insert(0, 'Afstand (km)', distances[order] * EARTH_RADIUS_KM)
+    return result
+
+
+def within_radius(index, lat, lon, radius_km, fast_only=False):
+    '''Alle laadpalen binnen radius_km van (lat, lon), gesorteerd op afstand.'''
+    tree, rows = _tree(index, fast_only)
+    if tree is None:
+        return _empty(index, rows)
+    point = np.radians([[lat, lon]])
+    positions, distances = tree.query_radius(point, r=radius_km / EARTH_RADIUS_KM, return_distance=True)
+    return _result(index, positions[0], distances[0], rows)
+
+
+def k_nearest(index, lat, lon, k=10, fast_only=False):
+    '''De k laadpalen die het dichtst bij (lat, lon) liggen, gesorteerd op afstand.'''
+    tree, rows = _tree(index, fast_only)
+    k = min(k, len(index['stations']) if rows is None else len(rows))
+    if not k:
+        return _empty(index, rows)
+    distances, positions = tree.query(np.radians([[lat, lon]]), k=k)
+    return _result(index, positions[0], distances[0], rows)
+
+
+def count_within_radius(index, lat, lon, radius_km, fast_only=False):
+    # Alleen het aantal, zonder de laadpalen zelf op te halen
+    tree, _ = _tree(index, fast_only)
+    if tree is None:
+        return 0
+    return int(tree.query_radius(np.radians([[lat, lon]]), r=radius_km / EARTH_RADIUS_KM, count_only=True)[0])
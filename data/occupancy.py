@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Bezetting van de laadpalen: hoeveel auto's er op elk moment verbonden zijn en hoeveel er daadwerkelijk
+# laden. Elke sessie is een interval [Started, Ended) (verbonden) en [Started, Started + ChargeTime)
+# (laden). In plaats van per minuut te tellen welke sessies actief zijn, krijgt elk interval een +1 op
+# de startminuut en een -1 op de eindminuut; de cumulatieve som daarvan is de bezetting per minuut.
+# Dat kost O(sessies + minuten), ook voor miljoenen sessies.
+
+MINUTE = np.timedelta64(1, 'm')
+WEEKDAYS = ['Maandag', 'Dinsdag', 'Woensdag', 'Donderdag', 'Vrijdag', 'Zaterdag', 'Zondag']
+
+
+def sweep(starts, ends, length):
+    '''
+    Aantal gelijktijdige intervallen per minuut. starts en ends zijn minuutnummers (int) vanaf het begin
+    van de tijdreeks, ends exclusief; intervallen met ends <= starts tellen niet mee.
+    '''
+    valid = ends > starts
+    deltas = np.bincount(starts[valid], minlength=length + 1) - np.bincount(ends[valid], minlength=length + 1)
+    return np.cumsum(deltas[:length]).astype(np.int32)
+
+
+def minute_occupancy_frame(data):
+    '''
+    Bezetting per minuut van een laadpaaldata frame. Geeft het eerste minuutnummer (start, een Timestamp)
+    en twee int32 arrays: connected (verbonden sessies) en charging (ladende sessies).
+    '''
+    started = data['Started'].to_numpy(dtype='datetime64[ns]')
+    ended = data['Ended'].to_numpy(dtype='datetime64[ns]')
+    # Laadtijd in uren, begrensd op de verbonden tijd (er staan sessies in met ChargeTime > ConnectedTime)
+    charge = np.clip(data['ChargeTime'].to_numpy(dtype=float, na_value=np.nan), 0, None)
+    charge_end = started + (np.nan_to_num(charge) * 3600e9).astype('timedelta64[ns]')
+    charge_end = np.minimum(charge_end, ended)
+
+    valid = ~(np.isnat(started) | np.isnat(ended))
+    started, ended, charge_end = started[valid], ended[valid], charge_end[valid]
+    if not len(started):
+        return {'start': pd.NaT, 'connected': np.zeros(0, np.int32), 'charging': np.zeros(0, np.int32)}
+
+    # Een sessie telt mee in elke minuut waarin hij (deels) actief is: start naar beneden, einde naar boven afgerond
+    origin = started.min().astype('datetime64[m]')
+    start_min = (started.astype('datetime64[m]') - origin) // MINUTE
+    end_min = -((origin - ended) // MINUTE)
+    charge_end_min = -((origin - charge_end) // MINUTE)
+    length = int(end_min.max())
+
+    return {
+        'start': pd.Timestamp(origin),
+        'connected': sweep(start_min, end_min, length),
+        'charging': sweep(start_min, charge_end_min, length),
+    }
+
+
+@st.cache_resource(show_spinner=False)
+def minute_occupancy(_data, version):
+    # Gedeeld door alle sessies; de arrays zijn alleen-lezen
+    occupancy = minute_occupancy_frame(_data)
+    occupancy['connected'].flags.writeable = False
+    occupancy['charging'].flags.writeable = False
+    return occupancy
+
+
+def occupancy_series(occupancy):
+    # Als DataFrame met een DatetimeIndex per minuut, bijvoorbeeld om te resamplen
+    index = pd.date_range(occupancy['start'], periods=len(occupancy['connected']), freq='min')
+    return pd.DataFrame({'connected': occupancy['connected'], 'charging': occupancy['charging']}, index=index)
+
+
+def profile(occupancy, by='hour'):
+    '''
+    Gemiddelde en maximale bezetting per uur van de dag (by='hour', 0-23) of per weekdag
+    (by='weekday', 0 = maandag). De minuutreeks wordt aangevuld tot hele dagen/weken en omgevormd,
+    zodat het gemiddelde en maximum in één numpy bewerking per kolom worden berekend.
+    '''
+    columns = ['connected', 'charging', 'connected_max', 'charging_max']
+    if not len(occupancy['connected']):
+        return pd.DataFrame(columns=columns)
+    start = occupancy['start']
+    if by == 'hour':
+        lead, shape, name = start.hour * 60 + start.minute, (24, 60), 'Hour'
+    elif by == 'weekday':
+        lead, shape, name = (start.dayofweek * 24 + start.hour) * 60 + start.minute, (7, 1440), 'Weekday'
+    else:
+        raise ValueError(f"by moet 'hour' of 'weekday' zijn, niet {by!r}")
+
+    period = shape[0] * shape[1]
+    result = {}
+    for column in ('connected', 'charging'):
+        values = occupancy[column]
+        trail = -(lead + len(values)) % period
+        padded = np.pad(values.astype(np.float32), (lead, trail), constant_values=np.nan).reshape(-1, *shape)
+        result[column] = np.nanmean(padded, axis=(0, 2))
+        result[column + '_max'] = np.nanmax(padded, axis=(0, 2)).astype(np.int32)
+    return pd.DataFrame(result, columns=columns).rename_axis(name)
+
+
+@st.cache_data(show_spinner=False)
+def occupancy_profile(_data, version, by='hour'):
+    return profile(minute_occupancy(_data, version), by)
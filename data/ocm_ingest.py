@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pandas as pd
+import requests
+from dotenv import load_dotenv
+
+from data.OpenChargeMapAPI import FLAGS, SCHEMA
+from data.schema import apply_schema
+from database.database import DataHandler
+
+# Incrementele import van de Open Charge Map API: alleen laadpalen die sinds de vorige sync zijn
+# gewijzigd worden opgehaald (modifiedsince) en op ID ge-upsert in een lokale SQLite store.
+# Gebruik: python -m data.ocm_ingest [--full] [--base-url URL]
+
+API_URL = 'https://api.openchargemap.io/v3/poi/'
+STORE = 'data/laadpalen.db'
+TABLE = 'laadpalen'
+MAX_RESULTS = 5000
+
+# De kolommen die de pagina's gebruiken; Provincie wordt bij het inladen bepaald (zie data.provincies)
+STORE_COLUMNS = [
+    'ID', 'OperatorID', 'UsageTypeID', 'UsageCost', 'Connections', 'NumberOfPoints', 'DateCreated',
+    'OperatorInfo.Title', 'UsageType.ID', 'UsageType.Title', 'AddressInfo.AddressLine1', 'AddressInfo.Town',
+    'AddressInfo.StateOrProvince', 'AddressInfo.Latitude', 'AddressInfo.Longitude',
+    'Connection.Level.Title', 'Connection.PowerKW', 'Year',
+    *FLAGS,
+]
+
+
+def fetch_changes(since=None, base_url=API_URL, api_key=None, session=requests, max_results=MAX_RESULTS):
+    '''
+    Haal alle Nederlandse laadpalen op die sinds `since` (datetime, UTC) zijn gewijzigd.
+    Bij meer dan max_results resultaten wordt doorgepagineerd met greaterthanid.
+    '''
+    params = {'output': 'json', 'countrycode': 'NL', 'compact': 'false', 'verbose': 'false',
+              'maxresults': max_results}
+    if api_key:
+        params['key'] = api_key
+    if since is not None:
+        params['modifiedsince'] = since.strftime('%Y-%m-%dT%H:%M:%S')
+
+    pois = {}
+    while True:
+        response = session.get(base_url, params=params, timeout=60)
+        response.raise_for_status()
+        page = response.json()
+        for poi in page:
+            pois[poi['ID']] = poi
+        if len(page) < max_results:
+            return list(pois.values())
+        params['greaterthanid'] = max(poi['ID'] for poi in page)
+
+
+def flatten(pois):
+    # Zet de geneste JSON (AddressInfo, OperatorInfo, Connections, ...) om naar de kolommen van de opgeschoonde dataset
+    if not pois:
+        # Ook zonder wijzigingen een frame met de types van het schema (een datetime DateCreated)
+        data = pd.DataFrame(columns=STORE_COLUMNS)
+    else:
+        data = pd.json_normalize(pois)
+        # Net als in de CSV: de eerste aansluiting als Connection.* kolommen, de volledige lijst als JSON tekst
+        connections = [poi.get('Connections') or [] for poi in pois]
+        first = pd.json_normalize([c[0] if c else {} for c in connections]).add_prefix('Connection.')
+        data = pd.concat([data.drop(columns=['Connections'], errors='ignore'), first], axis=1)
+        data['Connections'] = [json.dumps(c) for c in connections]
+
+    data['DateCreated'] = pd.to_datetime(data.get('DateCreated'), utc=True, errors='coerce')
+    data['Year'] = data['DateCreated'].dt.year
+    return apply_schema(data.reindex(columns=STORE_COLUMNS), SCHEMA)
+
+
+def _rows(data):
+    # SQLite kent geen pandas NA en geen booleans: NA wordt NULL en True/False wordt 1/0
+    data = data.copy()
+    data['DateCreated'] = data['DateCreated'].dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    for column in data.columns:
+        if data[column].dtype == 'boolean':
+            data[column] = data[column].astype('Int8')
+    data = data.astype(object).where(data.notna(), None)
+    return data.itertuples(index=False, name=None)
+
+
+def _open_store(path):
+    handler = DataHandler(path)
+    columns = ', '.join(f'"{column}"' + (' INTEGER PRIMARY KEY' if column == 'ID' else '')
+                        for column in STORE_COLUMNS)
+    handler.create_table(TABLE, columns)
+    handler.create_table('sync_state', 'name TEXT PRIMARY KEY, value TEXT')
+    return handler
+
+
+def last_sync(path=STORE):
+    if not os.path.exists(path):
+        return None
+    with sqlite3.connect(path) as conn:
+        row = conn.execute("SELECT value FROM sync_state WHERE name = 'modifiedsince'").fetchone()
+    return datetime.fromisoformat(row[0]) if row else None
+
+
+def sync(path=STORE, base_url=API_URL, api_key=None, full=False, session=requests, max_results=MAX_RESULTS):
+    '''
+    Haal de gewijzigde laadpalen op en upsert ze op ID in de store. Geeft het aantal gewijzigde rijen terug.
+    Het starttijdstip van de sync wordt de volgende `modifiedsince`, zodat er niets tussendoor valt;
+    ook als er niets is veranderd.
+    '''
+    started = datetime.now(timezone.utc)
+    since = None if full else last_sync(path)
+    data = flatten(fetch_changes(since, base_url=base_url, api_key=api_key, session=session,
+                                 max_results=max_results))
+
+    handler = _open_store(path)
+    try:
+        if len(data):
+            handler.upsert_data(TABLE, STORE_COLUMNS, _rows(data))
+        handler.upsert_data('sync_state', ['name', 'value'], [('modifiedsince', started.isoformat())])
+    finally:
+        handler.close_connection()
+    return len(data)
+
+
+def read_store(path=STORE):
+    # Lees de store als DataFrame met dezelfde kolommen als de CSV; dataclean zet de types goed
+    with sqlite3.connect(path) as conn:
+        return pd.read_sql_query(f'SELECT * FROM {TABLE}', conn)
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Incrementele import van Open Charge Map laadpalen')
+    parser.add_argument('--full', action='store_true', help='alles opnieuw ophalen in plaats van alleen wijzigingen')
+    parser.add_argument('--base-url', default=API_URL, help='bijv. een lokale test server')
+    parser.add_argument('--store', default=STORE)
+    args = parser.parse_args()
+    changed = sync(args.store, base_url=args.base_url, api_key=os.getenv('OCM_API_KEY'), full=args.full)
+    print(f'{changed} gewijzigde laadpalen opgeslagen in {args.store}')
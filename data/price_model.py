@@ -0,0 +1,103 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data.cache import CACHE_DIR
+
+# Het Ridge model voor de catalogusprijs wordt per versie van de RDW dataset één keer getraind en als
+# artifact in data/.cache opgeslagen; een rerun van de pagina laadt alleen nog het artifact. De getrainde
+# sklearn pipeline staat in een eigen bestand ernaast: het artifact voor de grafieken bevat alleen
+# pandas/numpy objecten, zodat het inladen ervan sklearn niet importeert. De pipeline wordt pas geladen
+# als er een nieuwe prijs voorspeld moet worden (load_price_pipeline).
+FEATURES = ['Aantal zitplaatsen', 'Lengte', 'Breedte', 'Vermogen massarijklaar']
+# Verhoog deze versie bij elke wijziging in train_price_model
+MODEL_VERSION = 3
+
+
+def train_price_model(data):
+    # sklearn wordt pas geimporteerd als er echt getraind moet worden
+    from sklearn.impute import SimpleImputer
+    from sklearn.linear_model import Ridge
+    from sklearn.model_selection import train_test_split
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    X = data[FEATURES]
+    y = data['Catalogusprijs']
+    # Handle missing values by imputing with mean
+    imputer = SimpleImputer(strategy='mean')
+    X = imputer.fit_transform(X)
+    # Splits de gegevens in trainings- en testsets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # Normalize the features
+    scaler = StandardScaler()
+    X_train = scaler.fit_transform(X_train)
+    X_test = scaler.transform(X_test)
+    # Create and fit a Ridge regression model
+    ridge_model = Ridge(alpha=1.0)
+    ridge_model.fit(X_train, y_train)
+    # Make predictions
+    y_pred = ridge_model.predict(X_test)
+
+    # Create a DataFrame to include residuals and 'Merk'
+    results_df = pd.DataFrame({
+        'Werkelijke Catalogusprijs': y_test,
+        'Voorspelde Catalogusprijs': y_pred,
+        'Residuen': y_test - y_pred,
+        'Merk': data.loc[y_test.index, 'Merk'].values  # Extract 'Merk' for each prediction
+    })
+    brand_means = results_df.groupby('Merk', observed=True).mean()
+    # Samenvatting van de residuen per merk
+    brand_residuals = results_df.groupby('Merk', observed=True)['Residuen'].describe()
+
+    # OLS trendlijn van voorspeld op werkelijk (wat px.scatter met trendline='ols' per rerun berekende)
+    slope, intercept = np.polyfit(results_df['Werkelijke Catalogusprijs'], results_df['Voorspelde Catalogusprijs'], 1)
+
+    return {
+        'pipeline': make_pipeline(imputer, scaler, ridge_model),  # al getraind, voor nieuwe voorspellingen
+        'results': results_df,
+        'brand_means': brand_means,
+        'brand_residuals': brand_residuals,
+        'trendline': (float(slope), float(intercept)),
+    }
+
+
+def _artifact_path(version, name='price_model'):
+    return os.path.join(CACHE_DIR, f'{name}-{version}-v{MODEL_VERSION}.joblib')
+
+
+def _dump(value, path):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + f'.{os.getpid()}.tmp'
+    joblib.dump(value, tmp_path)
+    os.replace(tmp_path, path)
+
+
+@st.cache_resource(show_spinner='Model trainen...')
+def load_price_model(_data, version):
+    # Laad het artifact voor deze versie van de dataset, of train en sla het op
+    path = _artifact_path(version)
+    if os.path.exists(path) and os.path.exists(_artifact_path(version, 'price_pipeline')):
+        return joblib.load(path)
+
+    model = train_price_model(_data)
+    # Eerst de pipeline, zodat er nooit een artifact is zonder bijbehorende pipeline
+    _dump(model.pop('pipeline'), _artifact_path(version, 'price_pipeline'))
+    _dump(model, path)
+    return model
+
+
+@st.cache_resource(show_spinner=False)
+def load_price_pipeline(_data, version):
+    # De getrainde pipeline voor nieuwe voorspellingen (importeert sklearn); traint zo nodig eerst het model
+    load_price_model(_data, version)
+    return joblib.load(_artifact_path(version, 'price_pipeline'))
+
+
+def predict_price(data, features):
+    '''De voorspelde catalogusprijs voor één auto, features: {feature: waarde} voor elke naam in FEATURES.'''
+    pipeline = load_price_pipeline(data, data.attrs.get('version', ''))
+    return float(pipeline.predict(pd.DataFrame([features], columns=FEATURES))[0])
@@ -1,24 +1,92 @@
+import logging
+
+import numpy as np
 import pandas as pd
-import streamlit as st
 import geopandas as gpd
+import shapely
+from pyproj import Transformer
 
 # Maak een GeoDataFrame met provincie grenzen
 # Bron: https://www.nationaalgeoregister.nl/geonetwork/srv/dut/catalog.search#/metadata/e73b01f6-28c7-4bb7-a782-e877e8113e2c
 
-@st.cache_data  # Cache the data to speed up app performance
+SOURCE = 'data/provincies.json'
+
+logger = logging.getLogger(__name__)
+
+
+# Tolerantie (in meters, EPSG:28992) voor de vereenvoudigde grenzen per zoomniveau van de kaart.
+# Op ~52 graden NB is een pixel ongeveer 750 m op zoom 7 en 190 m op zoom 9.
+SIMPLIFY_TOLERANCE = {7: 500, 9: 125}
+
+
+# In het geheugen wordt de dataset gedeeld via data.registry.provincies()
 def load_data():
-    provincies = gpd.read_file('data/provincies.json')
+    provincies = gpd.read_file(SOURCE)
     filtered_data = dataclean(provincies)
     return filtered_data
 
 
 def dataclean(provincies):
     provincies['PROVINCIENAAM'] = provincies['PROVINCIENAAM'].str.replace('Fryslân', 'Friesland')
-    geo_df_crs = {'init' : 'epsg:4326'}
-    gdf_provincies = gpd.GeoDataFrame(provincies)
-    gdf_provincies = gdf_provincies.to_crs(geo_df_crs)
-    return provincies
 
+    # Oppervlakte en middelpunt eenmalig berekenen in RD coordinaten (meters)
+    provincies['area_km2'] = provincies.geometry.area / 10**6
+    centroids = provincies.geometry.centroid.to_crs(epsg=4326)
+    provincies['centroid_lat'] = centroids.y
+    provincies['centroid_lon'] = centroids.x
+
+    # Vereenvoudigde grenzen per zoomniveau, met gedeelde grenzen tussen provincies intact
+    for zoom, tolerance in SIMPLIFY_TOLERANCE.items():
+        simplified = gpd.GeoSeries(_simplify(provincies.geometry.to_numpy(), tolerance), crs=provincies.crs)
+        provincies[f'geometry_z{zoom}'] = _round(simplified.to_crs(epsg=4326))
+
+    # Eenmalig omzetten naar lat/lon, zodat de pagina's niet meer hoeven te herprojecteren
+    return provincies.to_crs(epsg=4326)
+
+
+def _simplify(geometry, tolerance):
+    # coverage_simplify (shapely >= 2.1) houdt aangrenzende provincies aansluitend
+    if hasattr(shapely, 'coverage_simplify'):
+        return shapely.coverage_simplify(geometry, tolerance)
+    return shapely.simplify(geometry, tolerance, preserve_topology=True)
+
+
+def _round(geometry, decimals=5):
+    # 5 decimalen is ~1 meter en scheelt veel tekens in de GeoJSON payload
+    return gpd.GeoSeries(shapely.transform(geometry.to_numpy(), lambda coords: np.round(coords, decimals)),
+                         crs=geometry.crs)
+
+
+def province_layer(provincies, zoom, selected=None):
+    # De vereenvoudigde grenzen voor het zoomniveau (7 of 9), alleen met de kolommen die de kaart nodig heeft
+    layer = gpd.GeoDataFrame(provincies[['PROVINCIENAAM']], geometry=provincies[f'geometry_z{zoom}'].values,
+                             crs=provincies.crs)
+    if selected is not None:
+        layer = layer[layer['PROVINCIENAAM'].isin(selected)]
+    return layer
+
+
+def assign_provincie(data, provincies, lat='AddressInfo.Latitude', lon='AddressInfo.Longitude'):
+    '''
+    Bepaal voor elke laadpaal in welke provincie deze ligt met één bulk spatial join: een STRtree
+    index over alle laadpalen wordt bevraagd met de 12 provinciegrenzen (in plaats van een
+    polygoontest per rij). Laadpalen die in geen enkele provincie vallen krijgen een lege
+    Provincie en worden gemeld.
+    '''
+    transformer = Transformer.from_crs('EPSG:4326', provincies.crs, always_xy=True)
+    x, y = transformer.transform(data[lon].to_numpy(dtype=float), data[lat].to_numpy(dtype=float))
+    tree = shapely.STRtree(shapely.points(x, y))
+    prov_idx, point_idx = tree.query(provincies.geometry.to_numpy(), predicate='contains')
+
+    # Een punt op een grens kan in twee provincies vallen, neem dan de eerste
+    point_idx, first = np.unique(point_idx, return_index=True)
+    names = sorted(provincies['PROVINCIENAAM'])
+    codes = np.full(len(data), -1, dtype=np.int8)
+    codes[point_idx] = pd.Categorical(provincies['PROVINCIENAAM'].to_numpy()[prov_idx[first]], categories=names).codes
+    data['Provincie'] = pd.Categorical.from_codes(codes, categories=names)
 
-# Load the data
-export = gdf_provincies = load_data()
+    unassigned = int((codes == -1).sum())
+    data.attrs['unassigned_stations'] = unassigned
+    if unassigned:
+        logger.warning('%d van de %d laadpalen liggen buiten alle provincies', unassigned, len(data))
+    return data
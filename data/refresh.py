@@ -0,0 +1,170 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from data import registry
+
+# Stale-while-revalidate voor de Open Charge Map data. Met OCM_REFRESH_INTERVAL (seconden) laadt een
+# achtergrondthread de opgeschoonde dataset periodiek opnieuw in: via data.cache.load_cached, dus
+# alleen opnieuw opgeschoond als de bron (data/laadpalen.csv of de store van data/ocm_ingest.py) is
+# veranderd. Met OCM_REFRESH_SYNC=1 haalt de thread eerst de wijzigingen op uit de API. Een nieuwe
+# versie wordt pas gepubliceerd (registry.publish) als de views ervan klaar zijn; tot die tijd krijgen
+# alle sessies gewoon de vorige versie. Status: status(), en voor Prometheus OCM_REFRESH_PROM.
+# Met DASHBOARD_SESSION_SYNC=1 werkt dezelfde thread ook de kolomopslag van de laadsessies bij
+# (data/sessions.py); de pagina leest die opslag alleen.
+#
+#   OCM_REFRESH_INTERVAL=900 OCM_REFRESH_SYNC=1 streamlit run Home_overview.py
+
+DATASET = 'laadpalen'
+INTERVAL = float(os.getenv('OCM_REFRESH_INTERVAL', '0'))
+SYNC = os.getenv('OCM_REFRESH_SYNC') == '1'
+SESSION_SYNC = os.getenv('DASHBOARD_SESSION_SYNC') == '1'
+PROM_FILE = os.getenv('OCM_REFRESH_PROM', 'data/.cache/refresh.prom')
+
+logger = logging.getLogger(__name__)
+
+_status = {
+    'dataset': DATASET,
+    'version': None,
+    'refreshed_at': None,
+    'duration_seconds': None,
+    'attempted_at': None,
+    'refreshes': 0,
+    'failures': 0,
+    'sync_failures': 0,
+    'last_error': None,
+    'last_sync_error': None,
+}
+_lock = threading.Lock()
+# Wordt nooit vrijgegeven: wie hem als eerste pakt start de thread
+_started = threading.Lock()
+
+
+def start(interval=INTERVAL):
+    '''
+    Start (één keer per proces) de verversing, als er een interval is ingesteld. Gebeurt bij het
+    importeren van deze module, dus door de eerste pagina die hem importeert.
+    '''
+    from data import views
+    # Precomputed views worden niet uit de dataset berekend, verversen heeft dan geen zin
+    if interval <= 0 or views.PRECOMPUTED or not _started.acquire(blocking=False):
+        return
+    thread = threading.Thread(target=_run, args=(interval,), name='ocm-refresh', daemon=True)
+    registry.add_detached_context(thread)
+    thread.start()
+
+
+def _run(interval):
+    # De eerste versie laadt de pagina zelf; de thread ververst pas na een interval
+    while True:
+        time.sleep(interval)
+        refresh()
+        if SESSION_SYNC:
+            sync_sessions()
+
+
+def refresh():
+    '''
+    Laad de dataset opnieuw in en publiceer hem als de versie is veranderd. Geeft True terug als er
+    een nieuwe versie is. Een fout wordt geteld en gelogd, de vorige versie blijft dan staan. Een
+    mislukte sync met de API wordt apart geteld: de dataset wordt dan toch opnieuw ingeladen uit de
+    bron die er al is.
+    '''
+    from data import views
+    attempted_at = datetime.now(timezone.utc)
+    started = time.perf_counter()
+    if SYNC:
+        _sync()
+    try:
+        current = registry.dataset(DATASET)
+        data = registry.loader(DATASET)()
+        changed = data.attrs.get('version') != current.attrs.get('version')
+        if changed:
+            # Eerst de views voor de nieuwe versie, zodat de eerste sessie daarna er niet op wacht
+            views.prepare(DATASET, data)
+            registry.publish(DATASET, data)
+    except Exception as error:
+        with _lock:
+            _status.update(attempted_at=attempted_at, failures=_status['failures'] + 1, last_error=repr(error))
+        logger.exception('Verversen van %s mislukt', DATASET)
+        changed = False
+    else:
+        with _lock:
+            _status.update(version=data.attrs.get('version'), refreshed_at=datetime.now(timezone.utc),
+                           duration_seconds=time.perf_counter() - started, attempted_at=attempted_at,
+                           refreshes=_status['refreshes'] + changed, last_error=None)
+    try:
+        _write_prometheus(PROM_FILE)
+    except OSError:
+        logger.exception('Status van de verversing niet weggeschreven naar %s', PROM_FILE)
+    return changed
+
+
+def _sync():
+    # De wijzigingen uit de API naar de store van data/ocm_ingest.py
+    try:
+        from dotenv import load_dotenv
+        from data import ocm_ingest
+        load_dotenv()
+        ocm_ingest.sync(api_key=os.getenv('OCM_API_KEY'))
+    except Exception as error:
+        with _lock:
+            _status.update(sync_failures=_status['sync_failures'] + 1, last_sync_error=repr(error))
+        logger.exception('Sync van %s met de API mislukt', DATASET)
+    else:
+        with _lock:
+            _status.update(last_sync_error=None)
+
+
+def sync_sessions():
+    # De kolomopslag van de laadsessies bijwerken; sync slaat een ongewijzigde CSV direct over
+    from data import laadpaaldata, sessions
+    if not os.path.exists(laadpaaldata.SOURCE):
+        return
+    try:
+        sessions.sync()
+    except Exception:
+        logger.exception('Bijwerken van de opslag van de laadsessies mislukt')
+
+
+def status():
+    '''
+    De status van de verversing: de versie, wanneer en hoe snel de laatste geslaagde verversing was,
+    age_seconds (de leeftijd van die verversing), en het aantal nieuwe versies en fouten (van het
+    inladen en van de sync met de API).
+    '''
+    with _lock:
+        current = dict(_status)
+    refreshed_at = current['refreshed_at']
+    current['age_seconds'] = (datetime.now(timezone.utc) - refreshed_at).total_seconds() if refreshed_at else None
+    return current
+
+
+def _write_prometheus(prom_file):
+    # Textfile formaat van Prometheus, zoals monitoring/instrument.py; de leeftijd is time() - timestamp
+    current = status()
+    metrics = [
+        ('dashboard_refresh_last_success_timestamp_seconds', 'gauge', 'Tijdstip van de laatste geslaagde verversing',
+         current['refreshed_at'].timestamp() if current['refreshed_at'] else None),
+        ('dashboard_refresh_last_duration_seconds', 'gauge', 'Duur van de laatste geslaagde verversing',
+         current['duration_seconds']),
+        ('dashboard_refresh_versions_total', 'counter', 'Aantal gepubliceerde nieuwe versies', current['refreshes']),
+        ('dashboard_refresh_failures_total', 'counter', 'Aantal mislukte verversingen', current['failures']),
+        ('dashboard_refresh_sync_failures_total', 'counter', 'Aantal mislukte syncs met de API',
+         current['sync_failures']),
+    ]
+    lines = []
+    for name, kind, help_text, value in metrics:
+        if value is None:
+            continue
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name}{{dataset="{DATASET}"}} {value}']
+    os.makedirs(os.path.dirname(prom_file) or '.', exist_ok=True)
+    tmp_path = f'{prom_file}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, prom_file)
+
+
+start()
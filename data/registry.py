@@ -0,0 +1,288 @@
+import functools
+import logging
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from pandas.core import indexing
+
+# Eén gedeelde, alleen-lezen kopie van elke dataset per proces. st.cache_data geeft bij elke rerun een
+# nieuwe (ge-unpickelde) kopie van de hele DataFrame terug; st.cache_resource geeft aan alle sessies
+# hetzelfde object. Daarom worden alle arrays bevroren (writeable=False) en faalt elke poging om kolommen
+# toe te voegen, te overschrijven of te verwijderen direct, ook via df['kolom'].values of een slice
+# (head, iloc[a:b]) die de arrays deelt (dat geeft een ValueError van numpy). Afgeleide kolommen horen
+# in dataclean van de dataset, zodat ze één keer worden berekend en in de Parquet cache terechtkomen.
+#
+# Gebruik in een pagina:  df_lp = registry.laadpaaldata()
+# Een aanpasbare kopie is altijd mogelijk met df.copy() of na filteren (met een masker) of kolommen selecteren.
+
+logger = logging.getLogger(__name__)
+
+
+def _read_only_indexer(indexer):
+    # .loc/.iloc/.at/.iat die wel kunnen lezen maar niet schrijven
+    class ReadOnlyIndexer(indexer):
+        def __setitem__(self, key, value):
+            _read_only(self.obj)
+    return ReadOnlyIndexer
+
+
+_INDEXERS = {
+    'loc': _read_only_indexer(indexing._LocIndexer),
+    'iloc': _read_only_indexer(indexing._iLocIndexer),
+    'at': _read_only_indexer(indexing._AtIndexer),
+    'iat': _read_only_indexer(indexing._iAtIndexer),
+}
+
+
+def _shared(values):
+    # Een bevroren numpy array (of een view erop)
+    return isinstance(values, np.ndarray) and not values.flags.writeable
+
+
+class ReadOnlySeries(pd.Series):
+    # Een kolom van een bevroren DataFrame. Twee paden in pandas 2.1 werken niet op een alleen-lezen
+    # buffer: Series.median zet NaN in de array zelf (nanops.nanmedian) en een vergelijking op een
+    # object array (strings) eist een schrijfbare buffer. Die rekenen op een kopie van de kolom.
+
+    @property
+    def _constructor(self):
+        return pd.Series
+
+    def _slice(self, slobj, axis=0):
+        # head, tail en iloc[a:b] delen de bevroren array
+        return ReadOnlySeries(super()._slice(slobj, axis), copy=False)
+
+    def median(self, *args, **kwargs):
+        data = self.copy() if _shared(self._values) else self
+        return pd.Series.median(data, *args, **kwargs)
+
+    def _cmp_method(self, other, op):
+        data = self.copy() if self.dtype == object and _shared(self._values) else self
+        return pd.Series._cmp_method(data, other, op)
+
+
+class _ReadOnly:
+    # Blokkeert alle manieren om een DataFrame in-place aan te passen
+
+    loc = property(lambda self: _INDEXERS['loc']('loc', self))
+    iloc = property(lambda self: _INDEXERS['iloc']('iloc', self))
+    at = property(lambda self: _INDEXERS['at']('at', self))
+    iat = property(lambda self: _INDEXERS['iat']('iat', self))
+
+    def __setitem__(self, key, value):
+        _read_only(self)
+
+    def __delitem__(self, key):
+        _read_only(self)
+
+    def insert(self, *args, **kwargs):
+        _read_only(self)
+
+    def isetitem(self, *args, **kwargs):
+        _read_only(self)
+
+    def _update_inplace(self, *args, **kwargs):
+        # Alle inplace=True methodes (fillna, drop, sort_values, ...) komen hier langs
+        _read_only(self)
+
+    def _set_axis(self, *args, **kwargs):
+        # df.columns = ... en df.index = ...
+        _read_only(self)
+
+    def _set_axis_nocheck(self, labels, axis, inplace, copy):
+        # rename(inplace=True) en set_axis
+        if inplace:
+            _read_only(self)
+        return super()._set_axis_nocheck(labels, axis, inplace, copy)
+
+    def __setattr__(self, name, value):
+        # df.loc[nieuwe_rij] = ... vervangt de interne block manager
+        if name == '_mgr':
+            _read_only(self)
+        super().__setattr__(name, value)
+
+    def _slice(self, slobj, axis=0):
+        # head, tail en iloc[a:b] delen de bevroren arrays; pandas past de index van zo'n slice soms
+        # zelf aan (xs), dus die wordt geen ReadOnly frame, maar de kolommen wel ReadOnlySeries
+        sliced = super()._slice(slobj, axis)
+        return _SharedSlice(sliced, copy=False) if type(sliced) is pd.DataFrame else sliced
+
+    # median en vergelijkingen over de hele DataFrame op een kopie, zie ReadOnlySeries
+    def median(self, *args, **kwargs):
+        return self.copy().median(*args, **kwargs)
+
+    def _cmp_method(self, other, op):
+        return self.copy()._cmp_method(other, op)
+
+
+class ReadOnlyDataFrame(_ReadOnly, pd.DataFrame):
+    # Afgeleide frames (filters, kolomselecties, copy, ...) zijn weer gewone DataFrames
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    @property
+    def _constructor_sliced(self):
+        return ReadOnlySeries
+
+
+class _SharedSlice(pd.DataFrame):
+    # Een slice van een ReadOnlyDataFrame: de arrays zijn nog bevroren
+
+    @property
+    def _constructor(self):
+        return pd.DataFrame
+
+    @property
+    def _constructor_sliced(self):
+        return ReadOnlySeries
+
+
+@functools.cache
+def _read_only_geo_type():
+    # geopandas wordt pas geimporteerd als er een GeoDataFrame bevroren wordt (alleen de provincies)
+    import geopandas as gpd
+
+    class ReadOnlyGeoDataFrame(_ReadOnly, gpd.GeoDataFrame):
+
+        @property
+        def _constructor(self):
+            return gpd.GeoDataFrame
+
+        @property
+        def _constructor_sliced(self):
+            # De geometrie kolom blijft een GeoSeries, de andere kolommen worden ReadOnlySeries
+            constructor = super()._constructor_sliced
+
+            def sliced(*args, **kwargs):
+                series = constructor(*args, **kwargs)
+                return ReadOnlySeries(series, copy=False) if type(series) is pd.Series else series
+            return sliced
+    return ReadOnlyGeoDataFrame
+
+
+def _read_only(data):
+    raise TypeError(f"Deze dataset ({data.attrs.get('version', type(data).__name__)}) is gedeeld en alleen-lezen; "
+                    "maak eerst een kopie met .copy() of sla afgeleide kolommen op in dataclean")
+
+
+def freeze(data):
+    '''
+    Zet alle kolom arrays op writeable=False en geef de data terug als ReadOnly(Geo)DataFrame,
+    zonder de arrays te kopieren.
+    '''
+    for array in data._mgr.arrays:
+        # numpy arrays direct, extension arrays via hun interne numpy buffers
+        # (Categorical/DatetimeArray: _ndarray, BooleanArray/IntegerArray: _data en _mask, GeometryArray: _data)
+        for buffer in (array, getattr(array, '_ndarray', None), getattr(array, '_data', None),
+                       getattr(array, '_mask', None)):
+            if isinstance(buffer, np.ndarray):
+                buffer.flags.writeable = False
+    # Een GeoDataFrame betekent dat geopandas al geimporteerd is
+    geopandas = sys.modules.get('geopandas')
+    is_geo = geopandas is not None and isinstance(data, geopandas.GeoDataFrame)
+    frozen_type = _read_only_geo_type() if is_geo else ReadOnlyDataFrame
+    frozen = frozen_type(data, copy=False)
+    frozen.attrs = dict(data.attrs)
+    return frozen
+
+
+# Datasets die op de achtergrond opnieuw zijn ingeladen (zie data/refresh.py). Het vervangen van een
+# waarde in een dict is atomair: een lopende run houdt de oude DataFrame, de volgende krijgt de nieuwe.
+_published = {}
+
+
+def dataset(name):
+    published = _published.get(name)
+    return published if published is not None else _load(name)
+
+
+def publish(name, data):
+    # Vervang een dataset voor alle sessies vanaf hun volgende run
+    _published[name] = freeze(data)
+    return _published[name]
+
+
+@st.cache_resource(show_spinner='🏃 Loading...')
+def _load(name):
+    return freeze(loader(name)())
+
+
+def loader(name):
+    # De modules worden hier pas geimporteerd, zodat een pagina alleen de datasets inlaadt die hij gebruikt
+    if name == 'laadpaaldata':
+        from data.laadpaaldata import load_data
+    elif name == 'laadpalen':
+        from data.OpenChargeMapAPI import load_data
+    elif name == 'rdw':
+        from data.OpenDataRDW import load_data
+    elif name == 'provincies':
+        from data.provincies import load_data
+    else:
+        raise KeyError(f'Onbekende dataset: {name}')
+    return load_data
+
+
+def laadpaaldata():
+    return dataset('laadpaaldata')
+
+
+def laadpalen():
+    return dataset('laadpalen')
+
+
+def rdw():
+    return dataset('rdw')
+
+
+def provincies():
+    return dataset('provincies')
+
+
+# Met DASHBOARD_WARMUP=1 laadt een achtergrondthread na de eerste run van een pagina alle datasets
+# (of met data.views.warm_up alle views), zodat de andere keuzes en pagina's daar niet meer op wachten
+WARMUP = os.getenv('DASHBOARD_WARMUP') == '1'
+DATASETS = ['laadpalen', 'laadpaaldata', 'rdw', 'provincies']
+# Wordt nooit vrijgegeven: wie hem als eerste pakt start de thread
+_warm_up_once = threading.Lock()
+
+
+def warm_up(names=DATASETS, load=None):
+    '''Start (één keer per proces) een daemon thread die load(name) (standaard dataset) voor elke naam aanroept.'''
+    if not WARMUP or not _warm_up_once.acquire(blocking=False):
+        return
+    thread = threading.Thread(target=_warm_up, args=(list(names), load or dataset), name='dataset-warm-up', daemon=True)
+    add_detached_context(thread)
+    thread.start()
+
+
+def add_detached_context(thread=None):
+    '''
+    Geef een thread (standaard de huidige) een eigen ScriptRunContext zonder sessie. st.cache_data en
+    st.cache_resource lezen en schrijven alleen in een thread met een context; zonder context (een
+    achtergrondthread, of een script buiten `streamlit run`) wordt er niets gecachet. Berichten van
+    de thread, zoals spinners, gaan nergens heen.
+    '''
+    from streamlit.runtime.memory_uploaded_file_manager import MemoryUploadedFileManager
+    from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx
+    from streamlit.runtime.state import SafeSessionState, SessionState
+    context = ScriptRunContext(
+        session_id=f'detached-{id(thread)}', _enqueue=lambda message: None, query_string='',
+        session_state=SafeSessionState(SessionState()), uploaded_file_mgr=MemoryUploadedFileManager('/upload'),
+        page_script_hash='', user_info={'email': None},
+    )
+    return add_script_run_ctx(thread, context)
+
+
+def _warm_up(names, load):
+    for name in names:
+        try:
+            load(name)
+        except Exception as error:
+            # Niet fataal: de pagina laadt hem dan zelf en laat de fout zien
+            logger.warning('Warm-up van %s mislukt: %r', name, error)
@@ -0,0 +1,104 @@
+import sys
+
+import pandas as pd
+
+# Een schema koppelt kolomnamen aan een pandas dtype, of aan 'datetime' voor datumkolommen, bijvoorbeeld:
+# {'Merk': 'category', 'Catalogusprijs': 'float32', 'Is...': 'boolean', 'DateCreated': 'datetime'}
+# Een datumkolom in een vast formaat krijgt het formaat mee: (DATETIME, '%m/%d/%Y %I:%M:%S %p'). Zonder
+# formaat moet pandas het raden, en formaten als dat van de RDW parst het dan per waarde met dateutil
+# (ruim 15x zo traag).
+DATETIME = 'datetime'
+
+
+def _date_format(dtype):
+    # (is datumkolom, formaat of None)
+    if isinstance(dtype, tuple) and dtype[0] == DATETIME:
+        return True, dtype[1]
+    return dtype == DATETIME, None
+
+
+def split_schema(schema, columns):
+    # De dtypes voor read_csv en de datumkolommen met hun formaat, voor de kolommen die er zijn
+    dtypes, dates = {}, {}
+    for column, dtype in schema.items():
+        if column not in columns:
+            continue
+        is_date, date_format = _date_format(dtype)
+        if is_date:
+            dates[column] = date_format
+        else:
+            dtypes[column] = dtype
+    return dtypes, dates
+
+
+def parse_dates(data, dates):
+    # Zet de datumkolommen om; lukt het opgegeven formaat niet voor alle waardes, dan raadt pandas het
+    for column, date_format in dates.items():
+        try:
+            data[column] = pd.to_datetime(data[column], format=date_format)
+        except (ValueError, TypeError):
+            data[column] = pd.to_datetime(data[column], errors='coerce')
+    return data
+
+
+def read_csv_typed(path, schema, **kwargs):
+    # Lees een CSV direct met de dtypes uit het schema, zodat er geen tussenstap met object kolommen nodig is
+    columns = pd.read_csv(path, nrows=0, **kwargs).columns
+    dtypes, dates = split_schema(schema, columns)
+    data = parse_dates(pd.read_csv(path, dtype=dtypes, **kwargs), dates)
+    return compact(data, exclude=schema)
+
+
+def compact(data, exclude=()):
+    # Verklein de kolommen die niet in het schema staan: integers downcasten en
+    # strings met weinig unieke waardes omzetten naar categoricals
+    for column in data.columns:
+        if column in exclude:
+            continue
+        series = data[column]
+        if pd.api.types.is_integer_dtype(series) and not pd.api.types.is_extension_array_dtype(series):
+            data[column] = pd.to_numeric(series, downcast='integer')
+        elif series.dtype == object and len(series) > 0 and series.nunique() < len(series) / 2:
+            data[column] = series.astype('category')
+    return data
+
+
+def apply_schema(data, schema):
+    # Zet een al ingelezen DataFrame om naar het schema (bijv. data die niet uit een CSV komt)
+    for column, dtype in schema.items():
+        if column not in data.columns:
+            continue
+        is_date, date_format = _date_format(dtype)
+        if is_date:
+            parse_dates(data, {column: date_format})
+        elif dtype == 'boolean' and data[column].dtype == object:
+            data[column] = data[column].map({True: True, False: False, 'True': True, 'False': False}).astype('boolean')
+        else:
+            data[column] = data[column].astype(dtype)
+    return compact(data, exclude=schema)
+
+
+def memory_mb(data):
+    return data.memory_usage(deep=True).sum() / 2**20
+
+
+def memory_report(path, schema):
+    # Vergelijk het geheugengebruik van een ongetypeerde read_csv met de getypeerde versie
+    before = memory_mb(pd.read_csv(path))
+    after = memory_mb(read_csv_typed(path, schema))
+    return {'path': path, 'before_mb': round(before, 1), 'after_mb': round(after, 1),
+            'reduction': round(1 - after / before, 3) if before else 0.0}
+
+
+if __name__ == '__main__':
+    # Gebruik: python -m data.schema [ocm|rdw]
+    from data import OpenChargeMapAPI, OpenDataRDW
+
+    datasets = {
+        'ocm': (OpenChargeMapAPI.SOURCE, OpenChargeMapAPI.SCHEMA),
+        'rdw': (OpenDataRDW.SOURCE, OpenDataRDW.SCHEMA),
+    }
+    for name in sys.argv[1:] or datasets:
+        report = memory_report(*datasets[name])
+        print(f"{name}: {report['before_mb']} MB -> {report['after_mb']} MB "
+              f"({report['reduction']:.0%} kleiner) [{report['path']}]")
@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data import laadpaaldata
+from data.cache import CACHE_DIR
+
+# Kolomopslag van de laadsessies voor logs met tientallen miljoenen rijen: per kolom één binair
+# bestand (de ruwe kolommen en de afgeleide kolommen van laadpaaldata.dataclean), gesorteerd op
+# Started, dat met np.memmap wordt geopend. Een periode is dan twee binary searches op Started en
+# een slice van elke kolom zonder kopie; het OS leest alleen de pagina's van die periode in.
+#
+# De opslag volgt data/laadpaaldata.csv. Is de CSV alleen aangevuld (het oude deel is byte voor byte
+# gelijk, gecontroleerd met sha256), dan worden alleen de nieuwe regels ingelezen en achter de
+# bestanden geschreven; anders wordt alles opnieuw opgebouwd. De meta (meta.json) wordt als laatste
+# geschreven: een lezer ziet de nieuwe rijen pas als ze er helemaal staan. Eén schrijver per opslag.
+#
+#   python -m data.sessions                 # bijwerken (of opbouwen) vanuit de CSV
+#   sessions = store(); sessions_between(sessions, '2018-03-01', '2018-04-01')
+
+STORE_DIR = os.getenv('DASHBOARD_SESSION_STORE', os.path.join(CACHE_DIR, 'sessions'))
+META = 'meta.json'
+# Samen met laadpaaldata.DATACLEAN_VERSION de versie van de opslag; bij een andere versie alles opnieuw
+STORE_VERSION = 2
+CHUNKSIZE = 1_000_000
+
+# Het type van elke kolom in de opslag. Sessies zonder geldige Started worden niet opgeslagen,
+# daardoor heeft Hour geen ontbrekende waardes en past hij in een int8.
+COLUMNS = {
+    'Started': 'datetime64[ns]',
+    'Ended': 'datetime64[ns]',
+    'TotalEnergy': 'float64',
+    'ConnectedTime': 'float64',
+    'ChargeTime': 'float64',
+    'MaxPower': 'float64',
+    'Time over due': 'float64',
+    'TotalEnergy in kwh': 'float64',
+    'Power_kwh': 'float64',
+    'Hour': 'int8',
+    'Charging speed': 'float64',
+    'Efficiency': 'float64',
+    'Cost': 'float64',
+    'ChargeTime_min': 'float64',
+}
+
+try:
+    import fcntl
+except ImportError:  # Windows: alleen de lock tussen threads
+    fcntl = None
+
+_write_lock = threading.Lock()
+LOCK = '.lock'
+
+
+def _column_path(directory, name, generation):
+    # Een volledige herbouw schrijft een nieuwe generatie bestanden: een lezer kan de vorige nog open hebben
+    return os.path.join(directory, f"{name.replace(' ', '_')}.{generation}.bin")
+
+
+def read_meta(directory=STORE_DIR):
+    try:
+        with open(os.path.join(directory, META)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_meta(directory, meta):
+    tmp_path = os.path.join(directory, f'{META}.{os.getpid()}-{threading.get_ident()}.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(meta, file, indent=2)
+    os.replace(tmp_path, os.path.join(directory, META))
+
+
+def _clean(raw):
+    # De afgeleide kolommen van laadpaaldata, in de vaste types van de opslag en gesorteerd op Started
+    data = laadpaaldata.dataclean(raw)
+    data = data[data['Started'].notna()].sort_values('Started', kind='stable')
+    return {name: data[name].to_numpy(dtype=dtype) for name, dtype in COLUMNS.items()}, len(raw) - len(data)
+
+
+def _append_columns(directory, generation, rows, columns):
+    # Kap eerst af op de rijen in de meta: een eerder afgebroken aanvulling kan er rijen achter hebben
+    # gezet die nooit in de meta zijn gekomen (een lezer ziet alleen de rijen uit de meta)
+    for name, values in columns.items():
+        path = _column_path(directory, name, generation)
+        with open(path, 'r+b') as file:
+            file.truncate(rows * np.dtype(COLUMNS[name]).itemsize)
+            file.seek(0, os.SEEK_END)
+            file.write(np.ascontiguousarray(values).tobytes())
+
+
+def _sort(directory, generation, rows):
+    # Herstel de sortering op Started na een aanvulling met oudere sessies: alle kolommen in de volgorde
+    # van argsort naar een nieuwe generatie, zodat een afgebroken sortering de huidige niet raakt
+    started = np.memmap(_column_path(directory, 'Started', generation), dtype=COLUMNS['Started'], mode='r',
+                        shape=(rows,))
+    order = np.argsort(started, kind='stable')
+    del started
+    for name, dtype in COLUMNS.items():
+        values = np.memmap(_column_path(directory, name, generation), dtype=dtype, mode='r', shape=(rows,))
+        with open(_column_path(directory, name, generation + 1), 'wb') as file:
+            file.write(values[order].tobytes())
+        del values
+    return generation + 1
+
+
+def _time_bounds(directory, generation, rows):
+    if not rows:
+        return None, None
+    started = np.memmap(_column_path(directory, 'Started', generation), dtype=COLUMNS['Started'], mode='r',
+                        shape=(rows,))
+    return str(pd.Timestamp(started[0])), str(pd.Timestamp(started[-1]))
+
+
+def _complete_size(path, size, chunk_size=1 << 16):
+    # Het aantal bytes tot en met de laatste newline: een regel die nog wordt geschreven telt niet mee
+    with open(path, 'rb') as file:
+        end = size
+        while end > 0:
+            start = max(end - chunk_size, 0)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def _hash_prefix(path, size, end, chunk_size=1 << 20):
+    # sha256 van de eerste size bytes en van de eerste end bytes (end >= size), in één keer lezen
+    digest = hashlib.sha256()
+    prefix = digest.hexdigest() if size == 0 else None
+    with open(path, 'rb') as file:
+        read = 0
+        while read < end:
+            chunk = file.read(min(chunk_size, end - read))
+            if not chunk:
+                break
+            if prefix is None and read + len(chunk) >= size:
+                digest.update(chunk[:size - read])
+                prefix = digest.hexdigest()
+                digest.update(chunk[size - read:])
+            else:
+                digest.update(chunk)
+            read += len(chunk)
+    return prefix, digest.hexdigest()
+
+
+class _Range(io.RawIOBase):
+    # Alleen de bytes [start, end) van een bestand, voor read_csv
+    def __init__(self, path, start, end):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+def _ingest(directory, reader, meta):
+    # Schrijf de batches van reader achter de kolombestanden en houd bij of ze nog op volgorde zijn
+    last = np.datetime64(meta['last']) if meta.get('last') else None
+    in_order = True
+    rows = meta['rows']
+    for raw in reader:
+        columns, dropped = _clean(raw)
+        meta['dropped'] += dropped
+        if not len(columns['Started']):
+            continue
+        if last is not None and columns['Started'][0] < last:
+            in_order = False
+        last = columns['Started'][-1] if last is None else max(last, columns['Started'][-1])
+        _append_columns(directory, meta['generation'], rows, columns)
+        rows += len(columns['Started'])
+    # De meta wordt pas bijgewerkt als alles is geschreven
+    meta['rows'] = rows
+    if not in_order:
+        meta['generation'] = _sort(directory, meta['generation'], rows)
+    meta['first'], meta['last'] = _time_bounds(directory, meta['generation'], rows)
+
+
+def _remove_generation(directory, generation):
+    # Open memmaps van deze generatie blijven geldig, ook als het bestand weg is
+    for name in COLUMNS:
+        try:
+            os.remove(_column_path(directory, name, generation))
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def _locked(directory):
+    # Eén schrijver tegelijk: tussen threads met _write_lock, tussen processen (meerdere workers, de CLI)
+    # met een flock op een bestand in de opslag
+    os.makedirs(directory, exist_ok=True)
+    with _write_lock, open(os.path.join(directory, LOCK), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def sync(source=laadpaaldata.SOURCE, directory=STORE_DIR, chunksize=CHUNKSIZE, rebuild=False):
+    '''
+    Werk de opslag bij vanuit de CSV: niets als de CSV niet is veranderd, alleen de nieuwe regels
+    als hij is aangevuld, en anders (of met rebuild) alles opnieuw. Alleen volledige regels (tot en
+    met de laatste newline) worden ingelezen; de rest volgt bij een volgende sync. Geeft de meta terug.
+    Draait in de CLI (python -m data.sessions) of in de verversing van data/refresh.py, niet in een pagina.
+    '''
+    with _locked(directory):
+        meta = read_meta(directory)
+        stat = os.stat(source)
+        version = f'{STORE_VERSION}-{laadpaaldata.DATACLEAN_VERSION}'
+        same_version = meta.get('version') == version and not rebuild
+        old = meta.get('source', {})
+        if same_version and old.get('file_size') == stat.st_size and old.get('mtime_ns') == stat.st_mtime_ns:
+            return meta
+
+        size = _complete_size(source, stat.st_size)
+        old_size = old.get('size', 0) if same_version else 0
+        prefix, sha256 = _hash_prefix(source, min(old_size, size), size)
+        header = list(pd.read_csv(source, nrows=0).columns) if size else []
+        grown = (same_version and size >= old_size and prefix == old.get('sha256') and header == old.get('header'))
+        previous = meta.get('generation')
+        if grown:
+            # Alleen de nieuwe regels, vanaf het einde van de vorige versie van de CSV
+            meta = dict(meta)
+            start, names = old_size, {'header': None, 'names': header}
+        else:
+            os.makedirs(directory, exist_ok=True)
+            generation = 0 if previous is None else previous + 1
+            for name in COLUMNS:
+                open(_column_path(directory, name, generation), 'wb').close()
+            meta = {'version': version, 'generation': generation, 'rows': 0, 'dropped': 0, 'columns': COLUMNS}
+            start, names = 0, {}
+        if size > start:
+            with io.BufferedReader(_Range(source, start, size)) as file:
+                _ingest(directory, pd.read_csv(file, chunksize=chunksize, **names), meta)
+        else:
+            _ingest(directory, [], meta)
+
+        meta['source'] = {'path': source, 'size': size, 'file_size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                          'sha256': sha256, 'header': header}
+        meta['key'] = f"{version}-{meta['generation']}-{meta['rows']}-{sha256[:12]}"
+        _write_meta(directory, meta)
+        if previous is not None and previous != meta['generation']:
+            _remove_generation(directory, previous)
+        return meta
+
+
+def store(directory=STORE_DIR):
+    '''
+    De opslag zoals hij is als {'meta', 'columns': {naam: alleen-lezen memmap}}, of None. Leest de CSV
+    nooit (ook niet met DASHBOARD_PRECOMPUTED=1); bijwerken gaat met sync.
+    '''
+    meta = read_meta(directory)
+    if not meta:
+        return None
+    return _open(directory, meta['key'])
+
+
+# Na een aanvulling komt er een nieuwe key bij; de memmaps van de vorige versie vallen dan weg
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _open(directory, key):
+    meta = read_meta(directory)
+    rows = meta['rows']
+    columns = {}
+    for name, dtype in meta['columns'].items():
+        # np.memmap kan geen leeg bestand openen
+        columns[name] = (np.memmap(_column_path(directory, name, meta['generation']), dtype=dtype, mode='r', shape=(rows,))
+                         if rows else np.zeros(0, dtype=dtype))
+    return {'meta': meta, 'columns': columns}
+
+
+def bounds(sessions, start=None, end=None):
+    # Posities van de eerste sessie met Started >= start en de eerste met Started >= end
+    started = sessions['columns']['Started']
+    low = 0 if start is None else int(np.searchsorted(started, np.datetime64(pd.Timestamp(start), 'ns'), 'left'))
+    high = len(started) if end is None else int(np.searchsorted(started, np.datetime64(pd.Timestamp(end), 'ns'), 'left'))
+    return low, max(low, high)
+
+
+def sessions_between(sessions, start=None, end=None, columns=None):
+    '''
+    De sessies met start <= Started < end als DataFrame, zonder de kolommen te kopieren: elke kolom
+    is een slice van zijn memmap. Alleen de gevraagde kolommen (standaard alle) worden aangeraakt.
+    '''
+    low, high = bounds(sessions, start, end)
+    names = columns or list(sessions['columns'])
+    return pd.DataFrame({name: sessions['columns'][name][low:high] for name in names}, copy=False)
+
+
+def daily_summary(data):
+    '''
+    Per dag het aantal sessies, de geladen energie (kWh) en de gemiddelde laad- en verbonden tijd
+    (uren). data is gesorteerd op Started, dus elke dag is een aaneengesloten blok rijen.
+    '''
+    days = data['Started'].to_numpy().astype('datetime64[D]')
+    columns = ['Date', 'Sessions', 'Energy (kWh)', 'ChargeTime', 'ConnectedTime']
+    if not len(days):
+        return pd.DataFrame(columns=columns)
+    starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    counts = np.diff(np.r_[starts, len(days)])
+    sums = {name: np.add.reduceat(np.nan_to_num(data[name].to_numpy(dtype=float)), starts)
+            for name in ('TotalEnergy in kwh', 'ChargeTime', 'ConnectedTime')}
+    return pd.DataFrame({
+        'Date': days[starts],
+        'Sessions': counts,
+        'Energy (kWh)': sums['TotalEnergy in kwh'],
+        'ChargeTime': sums['ChargeTime'] / counts,
+        'ConnectedTime': sums['ConnectedTime'] / counts,
+    }, columns=columns)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Werk de kolomopslag van de laadsessies bij vanuit de CSV')
+    parser.add_argument('--source', default=laadpaaldata.SOURCE)
+    parser.add_argument('--store', default=STORE_DIR)
+    parser.add_argument('--rebuild', action='store_true', help='alles opnieuw opbouwen')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    meta = sync(args.source, args.store, args.chunksize, args.rebuild)
+    print(f"{meta['rows']} sessies ({meta['first']} - {meta['last']}) in {args.store}, "
+          f"{time.perf_counter() - started:.1f}s")
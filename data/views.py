@@ -0,0 +1,386 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from data import registry
+from data.aggregates import OUTSIDE_PROVINCES, dataset_version
+
+# Alles wat de pagina's tonen, als kleine DataFrames ("views"). Een view is een functie van één of meer
+# datasets uit data.registry. Normaal wordt hij één keer per versie van de datasets berekend; met
+# DASHBOARD_PRECOMPUTED=1 leest de pagina hem uit DASHBOARD_PRECOMPUTED_DIR (standaard data/precomputed),
+# zodat een worker kan starten zonder ooit de ruwe CSV bestanden in te laden. De bestanden worden
+# gemaakt met dezelfde functies:
+#
+#   python -m data.views                    # alle views naar data/precomputed
+#   python -m data.views --only rdw_monthly --output /tmp/views
+#
+# Gebruik in een pagina:  monthly = views.get('rdw_monthly')
+
+PRECOMPUTED = os.getenv('DASHBOARD_PRECOMPUTED') == '1'
+PRECOMPUTED_DIR = os.getenv('DASHBOARD_PRECOMPUTED_DIR', 'data/precomputed')
+MANIFEST = 'manifest.json'
+# Verhoog deze versie bij elke wijziging in een view, zodat oude precomputed bestanden worden geweigerd
+VIEWS_VERSION = 3
+
+VIEWS = {}
+
+
+def view(*datasets):
+    # Registreer een view met de namen van de datasets (zie registry.dataset) die hij nodig heeft
+    def register(build):
+        VIEWS[build.__name__] = (datasets, build)
+        return build
+    return register
+
+
+def get(name):
+    '''
+    De DataFrame van een view, gedeeld door alle sessies en alleen-lezen. attrs['version'] is de
+    versie van de datasets waaruit hij is berekend.
+    '''
+    if PRECOMPUTED:
+        return _read(name, PRECOMPUTED_DIR)
+    return compute(name)
+
+
+def compute(name, replace=None):
+    '''
+    Bereken de view uit de datasets, één keer per versie van de datasets. Met replace ({naam: DataFrame})
+    wordt een dataset vervangen, om de view voor een nieuwe versie al te berekenen voordat die wordt
+    gepubliceerd (zie data/refresh.py).
+    '''
+    datasets, _ = VIEWS[name]
+    replace = replace or {}
+    frames = [replace[dataset] if dataset in replace else registry.dataset(dataset) for dataset in datasets]
+    return _compute(name, frames, '-'.join(dataset_version(frame) for frame in frames))
+
+
+def prepare(dataset, data):
+    # Bereken alle views die een dataset gebruiken voor een nieuwe versie ervan
+    names = [name for name, (datasets, _) in VIEWS.items() if dataset in datasets]
+    for name in names:
+        compute(name, {dataset: data})
+    return names
+
+
+# Na een verversing van een dataset blijven de views van de vorige versies bewaard tot dit maximum
+@st.cache_resource(show_spinner=False, max_entries=100)
+def _compute(name, _frames, version):
+    # freeze maakt een nieuwe (alleen-lezen) DataFrame, dus de attrs van de bron blijven ongewijzigd
+    data = registry.freeze(VIEWS[name][1](*_frames))
+    data.attrs['version'] = f'v{VIEWS_VERSION}-{version}'
+    return data
+
+
+@st.cache_resource(show_spinner='🏃 Loading...')
+def _read(name, directory):
+    manifest = read_manifest(directory)
+    if manifest.get('views_version') != VIEWS_VERSION or name not in manifest.get('views', {}):
+        raise FileNotFoundError(f'Geen precomputed view {name!r} (versie {VIEWS_VERSION}) in {directory}; '
+                                'maak de views eerst met python -m data.views')
+    data = registry.freeze(pd.read_parquet(os.path.join(directory, f'{name}.parquet')))
+    data.attrs['version'] = manifest['views'][name]['version']
+    return data
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def materialize(directory=PRECOMPUTED_DIR, names=None):
+    '''
+    Bereken de views (standaard allemaal) uit de datasets en schrijf ze als Parquet naar directory,
+    samen met een manifest met VIEWS_VERSION en per view de versie van de datasets.
+    '''
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    if manifest.get('views_version') != VIEWS_VERSION:
+        manifest = {'views_version': VIEWS_VERSION, 'views': {}}
+    for name in names or VIEWS:
+        started = time.perf_counter()
+        data = compute(name)
+        path = os.path.join(directory, f'{name}.parquet')
+        # Schrijf eerst naar een tijdelijk bestand, zodat een worker nooit een half bestand leest
+        tmp_path = path + f'.{os.getpid()}.tmp'
+        data.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        manifest['views'][name] = {'version': data.attrs['version'], 'rows': len(data),
+                                   'datasets': list(VIEWS[name][0])}
+        print(f'{name}: {len(data)} rijen in {time.perf_counter() - started:.2f}s')
+
+    # Het manifest als laatste, zodat het alleen naar bestanden verwijst die er al zijn
+    manifest['created'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    tmp_path = os.path.join(directory, f'{MANIFEST}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def warm_up():
+    # Met DASHBOARD_WARMUP=1: alle views op de achtergrond laden (in de precomputed modus alleen de bestanden)
+    registry.warm_up(list(VIEWS), get)
+
+
+def histogram(name):
+    # Een histogram view terug als dict met counts en edges, zoals charts.histogram.numeric_bins
+    data = get(name)
+    if not len(data):
+        return {'counts': np.zeros(0, np.int64), 'edges': np.zeros(1)}
+    return {'counts': data['count'].to_numpy(), 'edges': np.append(data['left'].to_numpy(), data['right'].iloc[-1])}
+
+
+def _histogram_frame(histogram):
+    edges = histogram['edges']
+    return pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'count': histogram['counts']})
+
+
+def counts(name, column=None):
+    # Een telling (value, count) als Series; bij views met meerdere kolommen alleen die van column
+    data = get(name)
+    if column is not None:
+        data = data[data['column'] == column]
+    return data.set_index('value')['count']
+
+
+def rdw_brand_aggregates():
+    # De aggregaten per merk van pagina 4 (zie data.OpenDataRDW.brand_aggregates) uit de drie RDW views
+    brands, models, colors = get('rdw_brand_counts'), get('rdw_model_counts'), get('rdw_color_counts')
+    return _rdw_brand_aggregates(brands, models, colors, dataset_version(brands))
+
+
+@st.cache_resource(show_spinner=False)
+def _rdw_brand_aggregates(_brands, _models, _colors, version):
+    from data.OpenDataRDW import brand_aggregates
+    brands = _brands.set_index('Merk')
+    return brand_aggregates({
+        'brands': brands['count'],
+        'models': _models.set_index(['Merk', 'Handelsbenaming'])['count'],
+        'colors': _colors.set_index(['Merk', 'Eerste kleur'])['count'],
+        'price_sum': brands['price_sum'],
+        'price_count': brands['price_count'],
+    })
+
+
+# ----------------- Home ----------------------
+
+OCM_HEAD_COLUMNS = [
+    'ID', 'OperatorID', 'UsageTypeID', 'UsageCost', 'Connections', 'NumberOfPoints', 'DateCreated',
+    'OperatorInfo.Title', 'UsageType.IsPayAtLocation', 'UsageType.IsMembershipRequired',
+    'UsageType.IsAccessKeyRequired', 'UsageType.ID', 'UsageType.Title', 'StatusType.IsOperational',
+    'AddressInfo.AddressLine1', 'AddressInfo.Town', 'AddressInfo.StateOrProvince',
+]
+OCM_FLAGS = ['StatusType.IsOperational', 'Connection.Level.IsFastChargeCapable', 'UsageType.IsMembershipRequired']
+
+
+@view('laadpaaldata')
+def laadpaaldata_head(data):
+    return data.head()
+
+
+@view('laadpaaldata')
+def laadpaaldata_points(data):
+    # De sessies voor de scatter plot, met LTTB teruggebracht tot POINT_BUDGET punten
+    from charts.scatter import downsample
+    points, _ = downsample(data[['Started', 'TotalEnergy']], 'Started', 'TotalEnergy', mode='lttb')
+    points = points.reset_index(drop=True)
+    points.attrs['rows'] = len(data)
+    return points
+
+
+@view('rdw')
+def rdw_head(data):
+    return data.head()
+
+
+@view('rdw')
+def rdw_monthly(data):
+    # Het aantal (eerste) tenaamstellingen per maand; in de streaming modus uit de chunk aggregaten
+    from data.OpenDataRDW import load_aggregates
+    from data.aggregates import rdw_monthly_registrations
+    return rdw_monthly_registrations(load_aggregates(data))
+
+
+@view('laadpalen')
+def ocm_head(data):
+    return data[OCM_HEAD_COLUMNS].head()
+
+
+@view('laadpalen')
+def ocm_flag_counts(data):
+    # Aantal True/False per vlag, in volgorde van eerste voorkomen (bepaalt de kleur van de bars)
+    from charts.histogram import category_counts
+    return pd.concat([category_counts(data[column]).rename_axis('value').reset_index(name='count')
+                      .assign(column=column) for column in OCM_FLAGS], ignore_index=True)
+
+
+@view('laadpalen')
+def ocm_town_counts(data):
+    # De 25 steden met de meeste laadpalen
+    from charts.histogram import category_counts
+    towns = category_counts(data['AddressInfo.Town']).sort_values(ascending=False, kind='stable').head(25)
+    return towns.rename_axis('value').reset_index(name='count').astype({'value': str})
+
+
+@view('laadpalen')
+def ocm_power_histogram(data):
+    from charts.histogram import numeric_bins
+    return _histogram_frame(numeric_bins(data['Connection.PowerKW'].to_numpy(dtype=float, na_value=np.nan)))
+
+
+@view('laadpalen')
+def ocm_daily_registrations(data):
+    # Aantal laadpalen dat per dag is aangemaakt; als datum (zonder tijd), dat houdt de grafiek klein
+    daily = data['DateCreated'].dt.date.value_counts().sort_index()
+    return daily.rename_axis('Date').reset_index(name='count')
+
+
+# ----------------- Laadpaal data ----------------------
+
+CHARGE_TIME_BINS = range(0, 520, 20)
+
+
+@view('laadpaaldata')
+def occupancy_by_hour(data):
+    from data.occupancy import occupancy_profile
+    return occupancy_profile(data, dataset_version(data), 'hour')
+
+
+@view('laadpaaldata')
+def occupancy_by_weekday(data):
+    from data.occupancy import occupancy_profile
+    return occupancy_profile(data, dataset_version(data), 'weekday')
+
+
+@view('laadpaaldata')
+def session_time_means(data):
+    # Gemiddelde verbonden tijd en laadtijd, zonder sessies met een negatieve tijd
+    filtered = data[(data['ChargeTime'] >= 0) & (data['ConnectedTime'] >= 0)]
+    return pd.DataFrame({'Type': ['Connected Time', 'Charge Time'],
+                         'Mean Time': [filtered['ConnectedTime'].mean(), filtered['ChargeTime'].mean()]})
+
+
+@view('laadpaaldata')
+def charge_time_histogram(data):
+    # Laadtijden in minuten per bin van 20 minuten, met het gemiddelde en de mediaan in attrs
+    from charts.histogram import numeric_bins
+    charge_time = data['ChargeTime_min']
+    histogram = _histogram_frame(numeric_bins(charge_time.to_numpy(dtype=float, na_value=np.nan),
+                                              bins=CHARGE_TIME_BINS))
+    histogram.attrs.update(mean=float(charge_time.mean()), median=float(charge_time.median()))
+    return histogram
+
+
+# ----------------- Laadpaal locaties ----------------------
+
+@view('laadpalen', 'provincies')
+def station_count_cube(data, provincies):
+    from data import aggregates
+    return aggregates.station_count_cube(data, provincies, dataset_version(data))
+
+
+@view('laadpalen')
+def station_marker_data(data):
+    # Alleen de kolommen die de kaart nodig heeft (zie data.aggregates.station_markers)
+    markers = data[['AddressInfo.Latitude', 'AddressInfo.Longitude', 'Year', 'Provincie', 'Connection.Level.Title']]
+    markers.attrs['unassigned_stations'] = int(data.attrs.get('unassigned_stations', 0))
+    return markers
+
+
+@view('laadpalen')
+def station_hex_counts(data):
+    # Aantal laadpalen per hexagoon, provincie en jaar, voor elke grootte van de dichtheidslaag. Laadpalen
+    # buiten de provinciegrenzen krijgen OUTSIDE_PROVINCES, zodat ook zij in de hexagonen vallen
+    from charts.maps import HEX_SIZES_KM, hex_cells
+    located = data['AddressInfo.Latitude'].notna() & data['AddressInfo.Longitude'].notna() & data['Year'].notna()
+    stations = data.loc[located, ['AddressInfo.Latitude', 'AddressInfo.Longitude', 'Provincie', 'Year']]
+    provincies = stations['Provincie'].astype(object).fillna(OUTSIDE_PROVINCES).astype(str).to_numpy()
+    frames = []
+    for size_km in HEX_SIZES_KM:
+        q, r = hex_cells(stations['AddressInfo.Latitude'], stations['AddressInfo.Longitude'], size_km)
+        cells = pd.DataFrame({'q': q, 'r': r, 'Provincie': provincies, 'Year': stations['Year'].to_numpy(dtype=int)})
+        counts = cells.groupby(['q', 'r', 'Provincie', 'Year']).size().reset_index(name='count')
+        frames.append(counts.assign(size_km=size_km))
+    hex_counts = pd.concat(frames, ignore_index=True)
+    return hex_counts[['size_km', 'q', 'r', 'Provincie', 'Year', 'count']]
+
+
+@view('laadpalen')
+def station_search_data(data):
+    # Laadpalen met coordinaten en de gegevens van de aansluiting, voor de zoekboom van data.nearest
+    columns = ['ID', 'AddressInfo.Latitude', 'AddressInfo.Longitude', 'AddressInfo.AddressLine1',
+               'AddressInfo.Town', 'OperatorInfo.Title', 'Connection.Level.Title', 'Connection.PowerKW',
+               'Connection.Level.IsFastChargeCapable', 'NumberOfPoints']
+    located = data['AddressInfo.Latitude'].notna() & data['AddressInfo.Longitude'].notna()
+    return data.loc[located, columns].reset_index(drop=True)
+
+
+# ----------------- Elektrische voertuigen ----------------------
+
+@view('rdw')
+def rdw_brand_counts(data):
+    from data.OpenDataRDW import load_aggregates
+    aggregates = load_aggregates(data)
+    return pd.DataFrame({'count': aggregates['brands'], 'price_sum': aggregates['price_sum'],
+                         'price_count': aggregates['price_count']}).rename_axis('Merk').reset_index()
+
+
+@view('rdw')
+def rdw_model_counts(data):
+    from data.OpenDataRDW import load_aggregates
+    return load_aggregates(data)['models'].rename_axis(['Merk', 'Handelsbenaming']).reset_index(name='count')
+
+
+@view('rdw')
+def rdw_color_counts(data):
+    from data.OpenDataRDW import load_aggregates
+    return load_aggregates(data)['colors'].rename_axis(['Merk', 'Eerste kleur']).reset_index(name='count')
+
+
+@view('rdw')
+def price_brand_means(data):
+    from data.price_model import load_price_model
+    return load_price_model(data, dataset_version(data))['brand_means']
+
+
+@view('rdw')
+def price_brand_residuals(data):
+    # Samenvatting van de residuen (werkelijk - voorspeld) per merk
+    from data.price_model import load_price_model
+    return load_price_model(data, dataset_version(data))['brand_residuals'].reset_index()
+
+
+@view('rdw')
+def price_residuals(data):
+    # Een dichtheid-behoudende steekproef van de voorspellingen, met de OLS trendlijn in attrs
+    from charts.scatter import downsample
+    from data.price_model import load_price_model
+    model = load_price_model(data, dataset_version(data))
+    results = model['results']
+    points, _ = downsample(results, 'Werkelijke Catalogusprijs', 'Voorspelde Catalogusprijs')
+    points = points.reset_index(drop=True)
+    slope, intercept = model['trendline']
+    points.attrs.update(rows=len(results), slope=slope, intercept=intercept,
+                        x_min=float(results['Werkelijke Catalogusprijs'].min()),
+                        x_max=float(results['Werkelijke Catalogusprijs'].max()))
+    return points
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bereken de views van het dashboard en schrijf ze als Parquet")
+    parser.add_argument('--output', default=PRECOMPUTED_DIR, help=f'standaard {PRECOMPUTED_DIR}')
+    parser.add_argument('--only', nargs='+', choices=list(VIEWS), help='alleen deze views')
+    args = parser.parse_args()
+    started = time.perf_counter()
+    manifest = materialize(args.output, args.only)
+    print(f"{len(args.only or VIEWS)} views naar {args.output} in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+from database.database import DataHandler
+
+# Benchmark van het schrijven en opzoeken van laadsessies in SQLite.
+# Gebruik: python -m database.benchmark [--rows 10000 1000000 10000000]
+
+COLUMNS = 'id INTEGER, Started TEXT, Ended TEXT, TotalEnergy INTEGER, ConnectedTime REAL, ChargeTime REAL, MaxPower INTEGER'
+
+
+def session_rows(n, chunk_size=100_000, seed=0):
+    # Synthetische laadsessies zoals in laadpaaldata.csv, in chunks zodat 10M rijen niet in het geheugen hoeven
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2018-01-01T00:00:00')
+    for offset in range(0, n, chunk_size):
+        size = min(chunk_size, n - offset)
+        started = start + np.sort(rng.integers(0, 5 * 365 * 86400, size)).astype('timedelta64[s]')
+        connected = rng.uniform(0.1, 12, size)
+        ended = started + (connected * 3600).astype('timedelta64[s]')
+        yield from zip(
+            range(offset, offset + size),
+            np.char.replace(np.datetime_as_string(started), 'T', ' ').astype(object).tolist(),
+            np.char.replace(np.datetime_as_string(ended), 'T', ' ').astype(object).tolist(),
+            rng.integers(100, 60000, size).tolist(),
+            connected.round(4).tolist(),
+            (connected * rng.uniform(0.2, 1, size)).round(4).tolist(),
+            rng.integers(1000, 22000, size).tolist(),
+        )
+
+
+def lookup_latency(db_file, column, values, repeat):
+    # Gemiddelde tijd van een opzoeking op een geindexeerde kolom, in milliseconden
+    conn = sqlite3.connect(db_file)
+    started = time.perf_counter()
+    for value in values[:repeat]:
+        conn.execute(f'SELECT * FROM sessions WHERE {column} = ?', (value,)).fetchall()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return elapsed / min(repeat, len(values)) * 1000
+
+
+def run(n, legacy_limit=10_000, repeat=1000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, 'bench.db')
+        handler = DataHandler(db_file)
+        handler.create_table('sessions', COLUMNS, indexes=['Started', 'id'])
+
+        started = time.perf_counter()
+        handler.add_many('sessions', session_rows(n))
+        bulk_seconds = time.perf_counter() - started
+        handler.close_connection()
+
+        rng = np.random.default_rng(1)
+        sample = [row for row in session_rows(min(n, 10_000), seed=0)]
+        dates = [sample[i][1] for i in rng.integers(0, len(sample), repeat)]
+        ids = rng.integers(0, n, repeat).tolist()
+        result = {
+            'rows': n,
+            'bulk_rows_per_sec': round(n / bulk_seconds),
+            'date_lookup_ms': round(lookup_latency(db_file, 'Started', dates, repeat), 4),
+            'id_lookup_ms': round(lookup_latency(db_file, 'id', ids, repeat), 4),
+        }
+
+        # Ter vergelijking: een INSERT en commit per rij met de standaard SQLite instellingen
+        # (zoals add_data voorheen werkte), alleen op een kleine set
+        if n <= legacy_limit:
+            legacy = sqlite3.connect(os.path.join(tmp, 'legacy.db'))
+            legacy.execute(f'CREATE TABLE sessions ({COLUMNS})')
+            started = time.perf_counter()
+            for row in session_rows(n):
+                legacy.execute(f"INSERT INTO sessions VALUES ({','.join(['?'] * len(row))})", row)
+                legacy.commit()
+            result['per_row_commit_rows_per_sec'] = round(n / (time.perf_counter() - started))
+            legacy.close()
+        return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark van DataHandler bulk inserts en lookups')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+    for n in args.rows:
+        print(json.dumps(run(n)))
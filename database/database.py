@@ -1,30 +1,127 @@
 import sqlite3
 from datetime import datetime
+from itertools import islice
+
+import pandas as pd
+
+# Pragmas for fast bulk loads: WAL lets readers continue during a write, synchronous=NORMAL
+# only fsyncs at checkpoints, and a larger page cache keeps index pages in memory.
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+    'cache_size': -64000,  # in KiB, so 64 MB
+}
+
 
 class DataHandler:
     def __init__(self, db_file):
         self.conn = sqlite3.connect(db_file)
         self.cursor = self.conn.cursor()
+        for pragma, value in PRAGMAS.items():
+            self.cursor.execute(f"PRAGMA {pragma} = {value}")
 
-    def create_table(self, table_name, columns):
+    def create_table(self, table_name, columns, indexes=()):
         create_table_query = f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})"
         self.cursor.execute(create_table_query)
+        for column in indexes:
+            self.create_index(table_name, column, commit=False)
         self.conn.commit()
 
+    def create_index(self, table_name, column, commit=True):
+        index_name = f"idx_{table_name}_{column}".replace('.', '_').replace(' ', '_')
+        self.cursor.execute(f'CREATE INDEX IF NOT EXISTS "{index_name}" ON {table_name} ("{column}")')
+        if commit:
+            self.conn.commit()
+
     def add_data(self, table_name, data):
         insert_query = f"INSERT INTO {table_name} VALUES ({','.join(['?'] * len(data))})"
         self.cursor.execute(insert_query, data)
         self.conn.commit()
 
+    def add_many(self, table_name, rows, batch_size=10000):
+        # Insert a DataFrame or an iterator of row tuples with batched executemany in one transaction
+        if isinstance(rows, pd.DataFrame):
+            rows = _frame_rows(rows)
+        rows = iter(rows)
+        count = 0
+        with self.conn:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return 0
+            insert_query = f"INSERT INTO {table_name} VALUES ({','.join(['?'] * len(batch[0]))})"
+            while batch:
+                self.cursor.executemany(insert_query, batch)
+                count += len(batch)
+                batch = list(islice(rows, batch_size))
+        return count
+
+    def upsert_data(self, table_name, columns, rows):
+        # Insert or replace many rows (matched on the primary key) in one transaction
+        column_names = ','.join(f'"{column}"' for column in columns)
+        upsert_query = f"INSERT OR REPLACE INTO {table_name} ({column_names}) VALUES ({','.join(['?'] * len(columns))})"
+        with self.conn:
+            self.cursor.executemany(upsert_query, rows)
+
     def get_data_by_date(self, table_name, date_column, target_date):
         select_query = f"SELECT * FROM {table_name} WHERE {date_column} = ?"
         self.cursor.execute(select_query, (target_date,))
         return self.cursor.fetchall()
 
+    def get_data_between(self, table_name, column, start, end, columns=None, chunksize=None, **kwargs):
+        # Rows with start <= column < end as a DataFrame (or a generator of DataFrames when chunksize is set).
+        # With an index on column this is an index range scan, already sorted on that column.
+        select_query = (f'SELECT {_select(columns)} FROM {table_name} '
+                        f'WHERE "{column}" >= ? AND "{column}" < ? ORDER BY "{column}"')
+        return self.read_frame(select_query, (_param(start), _param(end)), chunksize=chunksize, **kwargs)
+
+    def get_data_by_keys(self, table_name, filters, columns=None, chunksize=None, **kwargs):
+        # Rows matching every filter, e.g. {'id': [1, 2, 3], 'Merk': 'TESLA'} (a list means IN)
+        conditions, params = [], []
+        for column, values in filters.items():
+            values = list(values) if isinstance(values, (list, tuple, set, pd.Index, pd.Series)) else [values]
+            conditions.append(f'"{column}" IN ({",".join(["?"] * len(values))})')
+            params.extend(_param(value) for value in values)
+        select_query = f'SELECT {_select(columns)} FROM {table_name}'
+        if conditions:
+            select_query += ' WHERE ' + ' AND '.join(conditions)
+        return self.read_frame(select_query, params, chunksize=chunksize, **kwargs)
+
+    def read_frame(self, query, params=(), chunksize=None, parse_dates=None, dtype=None):
+        # Run a query straight into pandas; parse_dates and dtype give typed columns instead of Python objects
+        return pd.read_sql_query(query, self.conn, params=params, chunksize=chunksize,
+                                 parse_dates=parse_dates, dtype=dtype)
+
     def delete_data_by_id(self, table_name, id_column, target_id):
         delete_query = f"DELETE FROM {table_name} WHERE {id_column} = ?"
         self.cursor.execute(delete_query, (target_id,))
         self.conn.commit()
 
     def close_connection(self):
-        self.conn.close()
\ No newline at end of file
+        self.conn.close()
+
+
+def _frame_rows(data):
+    # Datetimes are stored as text in the same format as the CSV files, NaN/NaT/NA become NULL
+    data = data.copy(deep=False)
+    for column in data.columns:
+        series = data[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            data[column] = series.dt.strftime('%Y-%m-%d %H:%M:%S').astype(object).where(series.notna(), None)
+        elif pd.api.types.is_extension_array_dtype(series):
+            # sqlite3 cannot bind pd.NA (nullable ints/booleans, categoricals)
+            data[column] = series.astype(object).where(series.notna(), None)
+    return data.itertuples(index=False, name=None)
+
+
+def _select(columns):
+    return ', '.join(f'"{column}"' for column in columns) if columns else '*'
+
+
+def _param(value):
+    # Dates are compared as text in the same format as they are stored by add_many
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if hasattr(value, 'item'):
+        return value.item()  # numpy scalars
+    return value
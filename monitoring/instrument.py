@@ -0,0 +1,209 @@
+import functools
+import io
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+import streamlit as st
+
+# Meet per onderdeel van een pagina (data laden, transformaties, grafieken) de tijd, het gealloceerde
+# geheugen en de grootte van wat er naar de browser gaat. Aanzetten met DASHBOARD_INSTRUMENT=1;
+# de metingen komen dan in een debug paneel in de sidebar, in een JSON-lines bestand en in een
+# Prometheus textfile (voor de node_exporter textfile collector). Staat het uit, dan is section()
+# een gedeelde lege context manager en geeft instrumented() de functie ongewijzigd terug.
+#
+# De tijd en de payload zijn per sessie, het geheugen niet: tracemalloc telt alle allocaties van het
+# proces en reset_peak() zet de piek voor alle threads terug. De geheugencijfers kloppen dus alleen als
+# er één sessie tegelijk draait, zoals in benchmarks/run.py. Een sectie die overlapte met een sectie
+# van een andere sessie krijgt concurrent=True; de geheugencijfers daarvan zijn niet betrouwbaar.
+#
+#   instrument.page('Home')
+#   with instrument.section('load'):
+#       df = registry.laadpaaldata()
+#   with instrument.section('render'):
+#       instrument.plotly_chart(fig)
+#   instrument.debug_panel()
+
+ENABLED = os.getenv('DASHBOARD_INSTRUMENT') == '1'
+LOG_FILE = os.getenv('DASHBOARD_INSTRUMENT_LOG', 'data/.cache/instrument.jsonl')
+PROM_FILE = os.getenv('DASHBOARD_INSTRUMENT_PROM', 'data/.cache/dashboard.prom')
+
+_NOOP = nullcontext()
+# Streamlit draait elke sessie in een eigen thread, dus de metingen van een run zijn per thread
+_run = threading.local()
+# Totalen over alle runs van dit proces, voor de Prometheus counters
+_totals = {}
+_lock = threading.Lock()
+# De open secties van alle sessies, om overlap te herkennen
+_open_all = []
+
+logger = logging.getLogger(__name__)
+
+
+def page(name):
+    # Aan het begin van een pagina: begin een nieuwe run
+    if not ENABLED:
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _run.page = name
+    _run.records = []
+    _run.open = []
+
+
+@contextmanager
+def _section(name):
+    record = {'page': getattr(_run, 'page', ''), 'section': name, 'payload_bytes': 0, 'concurrent': False}
+    open_sections = getattr(_run, 'open', [])
+    open_sections.append(record)
+    thread = threading.get_ident()
+    with _lock:
+        for other_thread, other in _open_all:
+            if other_thread != thread:
+                other['concurrent'] = record['concurrent'] = True
+        _open_all.append((thread, record))
+    # De geheugenpiek van tracemalloc is één teller voor het hele proces, dus geneste secties (en
+    # secties van andere sessies) delen hem
+    start_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        record['memory_bytes'] = current - start_memory
+        record['memory_peak_bytes'] = peak - start_memory
+        open_sections.remove(record)
+        with _lock:
+            _open_all.remove((thread, record))
+        getattr(_run, 'records', []).append(record)
+
+
+def section(name):
+    '''Context manager rond een blok van een pagina. Zonder DASHBOARD_INSTRUMENT=1 doet hij niets.'''
+    return _section(name) if ENABLED else _NOOP
+
+
+def instrumented(name=None):
+    '''Decorator: elke aanroep van de functie is een sectie (standaard met de naam van de functie).'''
+    def decorator(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with _section(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add_payload(size):
+    '''
+    Tel bytes die naar de browser gaan op bij de open secties. size mag een functie zijn, die wordt
+    alleen aangeroepen als de instrumentatie aan staat (bijvoorbeeld om een kaart te renderen).
+    '''
+    if not ENABLED or not getattr(_run, 'open', None):
+        return
+    size = size() if callable(size) else size
+    for record in _run.open:
+        record['payload_bytes'] += size
+
+
+def plotly_chart(figure, **kwargs):
+    # st.plotly_chart, en de grootte van het bericht aan de browser als payload
+    st.plotly_chart(figure, **kwargs)
+    add_payload(lambda: _plotly_payload(figure))
+
+
+def _plotly_payload(figure):
+    # Dezelfde serialisatie als st.plotly_chart
+    from streamlit.elements.plotly_chart import marshall
+    from streamlit.proto.PlotlyChart_pb2 import PlotlyChart
+    proto = PlotlyChart()
+    marshall(proto, figure, False, 'streamlit', 'streamlit')
+    return proto.ByteSize()
+
+
+def pyplot(figure, **kwargs):
+    # st.pyplot stuurt de figuur als PNG; meet die eerst, st.pyplot kan de figuur leegmaken
+    add_payload(lambda: _png_size(figure))
+    st.pyplot(figure, **kwargs)
+
+
+def _png_size(figure):
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.tell()
+
+
+def debug_panel():
+    '''Aan het einde van een pagina: toon de metingen in de sidebar en schrijf ze weg.'''
+    if not ENABLED:
+        return
+    records = getattr(_run, 'records', [])
+    with st.sidebar.expander('⏱️ Debug', expanded=False):
+        st.dataframe([{
+            'sectie': record['section'],
+            'ms': round(record['seconds'] * 1000, 1),
+            'geheugen MB': round(record['memory_bytes'] / 2**20, 2),
+            'piek MB': round(record['memory_peak_bytes'] / 2**20, 2),
+            'payload kB': round(record['payload_bytes'] / 1024, 1),
+        } for record in records], hide_index=True)
+        if any(record['concurrent'] for record in records):
+            st.caption('Er liep tegelijk een andere sessie: het geheugen is van het hele proces.')
+    try:
+        write(records)
+    except OSError:
+        logger.exception('Instrumentatie niet weggeschreven naar %s', LOG_FILE)
+
+
+def write(records, log_file=LOG_FILE, prom_file=PROM_FILE):
+    timestamp = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+    with _lock:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        with open(log_file, 'a') as file:
+            for record in records:
+                file.write(json.dumps({'time': timestamp, **record}) + '\n')
+        for record in records:
+            totals = _totals.setdefault((record['page'], record['section']), {'runs': 0, 'seconds': 0.0})
+            totals['runs'] += 1
+            totals['seconds'] += record['seconds']
+            totals['last'] = record
+        _write_prometheus(prom_file)
+
+
+def _write_prometheus(prom_file):
+    # Textfile formaat van Prometheus; atomair vervangen zodat de collector nooit een half bestand leest
+    metrics = [
+        ('dashboard_section_runs_total', 'counter', 'Aantal runs van een sectie', lambda t: t['runs']),
+        ('dashboard_section_seconds_total', 'counter', 'Totale tijd in een sectie', lambda t: t['seconds']),
+        ('dashboard_section_last_seconds', 'gauge', 'Tijd van de laatste run', lambda t: t['last']['seconds']),
+        ('dashboard_section_last_memory_bytes', 'gauge', 'Gealloceerd geheugen in de laatste run',
+         lambda t: t['last']['memory_bytes']),
+        ('dashboard_section_last_memory_peak_bytes', 'gauge', 'Geheugenpiek in de laatste run',
+         lambda t: t['last']['memory_peak_bytes']),
+        ('dashboard_section_last_payload_bytes', 'gauge', 'Bytes naar de browser in de laatste run',
+         lambda t: t['last']['payload_bytes']),
+    ]
+    lines = []
+    for name, kind, help_text, value in metrics:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for (page_name, section_name), totals in sorted(_totals.items()):
+            labels = f'page="{_escape(page_name)}",section="{_escape(section_name)}"'
+            lines.append(f'{name}{{{labels}}} {value(totals)}')
+    os.makedirs(os.path.dirname(prom_file) or '.', exist_ok=True)
+    tmp_file = f'{prom_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+    os.replace(tmp_file, prom_file)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -1,4 +1,5 @@
-import pandas as pd
+from datetime import date, timedelta
+
 import streamlit as st
 import matplotlib.pyplot as plt
 import plotly.express as px
@@ -17,85 +18,129 @@ st.set_page_config(
 )
 
 # ----------------- DATA ----------------------
-from data.laadpaaldata import laadpaal_data as df_lp
+from monitoring import instrument
+instrument.page('Laadpaal data')
+
+# Alle grafieken komen uit data/views.py (berekend, of met DASHBOARD_PRECOMPUTED=1 vooraf berekend)
+from data import sessions, views
+from data.occupancy import WEEKDAYS
 
 # ----------------- PAGES ---------------------
 st.title(page_title + ' ' + page_icon)
 
 st.write('''
-### Oplaad momenten
-Dit is de verdeling van het gebruik van de laadpalen gedurende de dag. Om 7 uur 's ochtends is het het drukst is, met 1053 oplaadsessies. Om 1 uur 's nachts is het daarentegen het rustigst, met slechts 4 oplaadsessies. 
-Er lijken pieken te zijn wanneer mensen 's morgens de deur uitgaan (06:00-08:00), tijdens de lunch (11:00) en aan het einde van de werkdag (16:00).
+### Bezetting gedurende de dag
+Hoeveel auto's staan er gemiddeld tegelijk aan de laadpalen, en hoeveel daarvan zijn op dat moment echt aan het laden? Dit is per minuut berekend uit de start- en eindtijden van alle sessies.
+Rond 13:00 zijn er gemiddeld bijna 10 auto's verbonden, 's nachts ongeveer 6: veel auto's blijven de hele nacht aan de laadpaal staan. Er wordt het meest geladen tussen 08:00 en 10:00 (gemiddeld 5,5 auto's tegelijk), rond 03:00 nog maar 0,4.
+Het hoogste aantal auto's dat tegelijk verbonden was is 23.
 ''')
 
-# Converteer de 'Started' en 'Ended' kolommen naar datetime-objecten
-df_lp['Started'] = pd.to_datetime(df_lp['Started'])
-df_lp['Ended'] = pd.to_datetime(df_lp['Ended'])
+with instrument.section('bezetting per uur'):
+    # Bezetting per minuut met een sweep-line over de sessies (zie data/occupancy.py), eenmalig per versie van de dataset
+    hourly_occupancy = views.get('occupancy_by_hour').reset_index()
 
-# Bepaal de tijdsintervallen (bijv. per uur)
-df_lp['Hour'] = df_lp['Started'].dt.hour
+    # Plotly Line Chart
+    fig = px.line(hourly_occupancy, x='Hour', y=['connected', 'charging'], title='Charging station occupancy throughout the day')
+    fig.update_traces(mode='markers+lines', marker=dict(size=8, line=dict(width=2)))
+    fig.for_each_trace(lambda trace: trace.update(name={'connected': 'Verbonden', 'charging': 'Aan het laden'}[trace.name]))
+    fig.update_xaxes(title='Hour of the day')
+    fig.update_yaxes(title='Average number of connected vehicles')
+    fig.update_layout(legend_title_text='')
+    instrument.plotly_chart(fig)
 
-# Tel het aantal oplaadsessies per uur
-hourly_counts = df_lp.groupby('Hour').size().reset_index(name='Count')
-
-# Plotly Line Chart
-fig = px.line(hourly_counts, x='Hour', y='Count', title='Charging station occupancy throughout the day')
-fig.update_traces(mode='markers+lines', marker=dict(size=8, line=dict(width=2)))
-fig.update_xaxes(title='Hour of the day')
-fig.update_yaxes(title='Number of charging sessions')
-st.plotly_chart(fig)
+st.write('''
+### Bezetting per weekdag
+Over de week is de bezetting vrij gelijk. Op woensdag zijn er gemiddeld de meeste auto's verbonden (7,9), op maandag en donderdag de minste (7,0).
+''')
+with instrument.section('bezetting per weekdag'):
+    weekday_occupancy = views.get('occupancy_by_weekday').reset_index()
+    weekday_occupancy['Weekday'] = [WEEKDAYS[day] for day in weekday_occupancy['Weekday']]
+    fig = px.bar(weekday_occupancy, x='Weekday', y=['connected', 'charging'], barmode='group',
+                 title='Charging station occupancy per weekday')
+    fig.for_each_trace(lambda trace: trace.update(name={'connected': 'Verbonden', 'charging': 'Aan het laden'}[trace.name]))
+    fig.update_xaxes(title='Weekday')
+    fig.update_yaxes(title='Average number of connected vehicles')
+    fig.update_layout(legend_title_text='')
+    instrument.plotly_chart(fig)
 
 # Plot Charge time VS Connected time
 st.write('''
 ### ConnectedTime vs ChargeTime
 De meeste auto's zijn veel langer verbonden met de laadpaal dan dat ze daadwerkelijk opladen, gemiddeld wel 3 keer zo lang.
 ''')
-# Calculate the mean connected time and mean charging time
-filtered_df = df_lp[(df_lp['ChargeTime'] >= 0) & (df_lp['ConnectedTime'] >= 0)]
-mean_connected_time = filtered_df['ConnectedTime'].mean()
-mean_charge_time = filtered_df['ChargeTime'].mean()
-mean_df = pd.DataFrame({'Type': ['Connected Time', 'Charge Time'],
-                        'Mean Time': [mean_connected_time, mean_charge_time]})
-# Create a grouped bar chart for mean values
-fig = px.bar(mean_df, x='Type', y='Mean Time')
-# Update layout
-fig.update_xaxes(title='Type')
-fig.update_yaxes(title='Time (hours)')
-# Add title
-fig.update_layout(title_text='Mean Connected Time vs Mean Charge Time')
-# Show the figure
-st.plotly_chart(fig)
+with instrument.section('connected vs charge time'):
+    # The mean connected time and mean charging time
+    mean_df = views.get('session_time_means')
+    # Create a grouped bar chart for mean values
+    fig = px.bar(mean_df, x='Type', y='Mean Time')
+    # Update layout
+    fig.update_xaxes(title='Type')
+    fig.update_yaxes(title='Time (hours)')
+    # Add title
+    fig.update_layout(title_text='Mean Connected Time vs Mean Charge Time')
+    # Show the figure
+    instrument.plotly_chart(fig)
 
 st.write('''
 ### Verdeling oplaadtijd
 De gemiddelde oplaadtijd is 106 minuten, de mediaan ligt iets hoger met 134 minuten.
 ''')
-# Set a custom style (optional)
-sns.set(style="whitegrid")
-
-# Create a smaller figure with a specified size
-fig_3, ax = plt.subplots(figsize=(8, 6))
-
-# Plot the histogram using seaborn for improved aesthetics
-sns.histplot(df_lp['ChargeTime_min'], bins=range(0, 520, 20), edgecolor='black', ax=ax, kde=False)
-
-# Add labels and title
-ax.set_xlabel('Charge Time (minutes)')
-ax.set_ylabel('Frequency')
-ax.set_title('Histogram of Charge Times')
-
-# Add annotation for mean and median
-mean = df_lp['ChargeTime_min'].mean()
-median = df_lp['ChargeTime_min'].median()
-ax.axvline(mean, color='red', linestyle='dashed', linewidth=1)
-ax.axvline(median, color='green', linestyle='dashed', linewidth=1)
-ax.annotate(f"Mean: {mean:.0f}", xy=(mean, 1400), xytext=(mean-120, 1300),
-            arrowprops=dict(color='red', arrowstyle='->'))
-ax.annotate(f"Median: {median:.0f}", xy=(median, 1400), xytext=(median+60, 1300),
-            arrowprops=dict(color='green', arrowstyle='->'))
-
-# Adjust the layout to prevent clipping of labels
-plt.tight_layout()
-
-# Show the plot
-st.pyplot(fig_3)
\ No newline at end of file
+with instrument.section('oplaadtijd'):
+    # Set a custom style (optional)
+    sns.set(style="whitegrid")
+
+    # Create a smaller figure with a specified size
+    fig_3, ax = plt.subplots(figsize=(8, 6))
+
+    # Plot the histogram using seaborn for improved aesthetics; the bins are counted on the server
+    charge_times = views.get('charge_time_histogram')
+    sns.histplot(x=charge_times['left'], weights=charge_times['count'], bins=views.CHARGE_TIME_BINS,
+                 edgecolor='black', ax=ax, kde=False)
+
+    # Add labels and title
+    ax.set_xlabel('Charge Time (minutes)')
+    ax.set_ylabel('Frequency')
+    ax.set_title('Histogram of Charge Times')
+
+    # Add annotation for mean and median
+    mean = charge_times.attrs['mean']
+    median = charge_times.attrs['median']
+    ax.axvline(mean, color='red', linestyle='dashed', linewidth=1)
+    ax.axvline(median, color='green', linestyle='dashed', linewidth=1)
+    ax.annotate(f"Mean: {mean:.0f}", xy=(mean, 1400), xytext=(mean-120, 1300),
+                arrowprops=dict(color='red', arrowstyle='->'))
+    ax.annotate(f"Median: {median:.0f}", xy=(median, 1400), xytext=(median+60, 1300),
+                arrowprops=dict(color='green', arrowstyle='->'))
+
+    # Adjust the layout to prevent clipping of labels
+    plt.tight_layout()
+
+    # Show the plot
+    instrument.pyplot(fig_3)
+
+st.write('''
+### Sessies per periode
+Kies een periode om per dag het aantal sessies en de geladen energie te zien. De sessies staan in een kolomopslag op schijf, gesorteerd op starttijd: alleen de gekozen periode wordt ingelezen.
+''')
+with instrument.section('sessies per periode'):
+    # Memory-mapped kolommen uit data/sessions.py; bijgewerkt door python -m data.sessions of data/refresh.py
+    session_store = sessions.store()
+    if session_store is None or not session_store['meta']['rows']:
+        st.caption('Er is nog geen opslag van de laadsessies (maak hem met python -m data.sessions).')
+    else:
+        first = date.fromisoformat(session_store['meta']['first'][:10])
+        last = date.fromisoformat(session_store['meta']['last'][:10])
+        period = st.date_input('Selecteer een periode', value=(max(first, last - timedelta(days=30)), last),
+                               min_value=first, max_value=last)
+        # Tijdens het kiezen van de periode is er nog maar één datum
+        start, end = (period[0], period[-1]) if isinstance(period, (tuple, list)) else (period, period)
+        selection = sessions.sessions_between(session_store, start, end + timedelta(days=1),
+                                              columns=['Started', 'TotalEnergy in kwh', 'ChargeTime', 'ConnectedTime'])
+        daily = sessions.daily_summary(selection)
+        fig = px.bar(daily, x='Date', y='Energy (kWh)', hover_data=['Sessions', 'ChargeTime', 'ConnectedTime'],
+                     title='Geladen energie per dag')
+        fig.update_yaxes(title='Energy (kWh)')
+        instrument.plotly_chart(fig)
+        st.caption(f"{len(selection)} sessies, samen {daily['Energy (kWh)'].sum():.0f} kWh geladen.")
+
+instrument.debug_panel()
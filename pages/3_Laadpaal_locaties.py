@@ -1,7 +1,6 @@
 import pandas as pd
 import streamlit as st
 import folium
-from folium.plugins import MarkerCluster
 from streamlit_folium import st_folium
 
 # ---------------- SETTINGS -------------------
@@ -17,8 +16,19 @@ st.set_page_config(
 )
 
 # ----------------- DATA ----------------------
-from data.OpenChargeMapAPI import realTimeLaadPalenData as df_laadpaal
-from data.provincies import gdf_provincies
+from monitoring import instrument
+instrument.page('Laadpaal locaties')
+
+# De laadpalen komen uit data/views.py (berekend, of met DASHBOARD_PRECOMPUTED=1 vooraf berekend);
+# de provinciegrenzen worden altijd uit data/provincies.json geladen. Het importeren van data.refresh
+# start de verversing van de OCM data (alleen met OCM_REFRESH_INTERVAL), ook als deze pagina eerst opent
+from data import nearest, refresh, registry, views  # noqa: F401
+from data.provincies import province_layer
+from data.aggregates import dataset_version, select_hex_cells, select_markers, station_counts_for_year, station_markers
+from charts.maps import HEX_SIZES_KM, hex_layer, marker_cluster
+with instrument.section('load'):
+    df_laadpaal = views.get('station_marker_data')
+    gdf_provincies = registry.provincies()
 
 # ----------------- PAGES ---------------------
 st.title(page_title + ' ' + page_icon)
@@ -28,42 +38,26 @@ Op deze kaart wordt de verdeling van laadpalen over Nederland in een bepaald jaa
 Tussen 2012 en 2014 werden er vooral in Zuid-Holland en Brabant veel nieuwe laadpalen geregistreerd, daarna kwamen er ook in Zuid-Holland een flink aantal bij.
 ''')
 
-# Maak een DataFrame met het aantal laadpalen per provincie in het geselecteerde jaar
-def create_cumcount(data, geodata):
-    # Get the count of unique locations in this dataframe
-    data['count'] = data[['AddressInfo.Latitude', 'AddressInfo.Longitude']].astype(str).agg('-'.join, axis=1)
-    unique_locations = data['count'].nunique()
-
-    # Maak een dataframe cumcount_df met de count voor elk jaar per provincie
-    count_df = data.groupby(['Year', 'Provincie']).agg({'count': 'nunique'}).reset_index()
-    count_df = count_df.sort_values(by=['Year', 'Provincie'], ascending=True)
-
-    # Bereken de cumulatieve count binnen elke provincie
-    count_df['cum_count'] = count_df.groupby('Provincie')['count'].cumsum()
-
-    # Bereken de laadpalen per km2 (obv de cum_count)
-    area_dict = geodata.set_index('PROVINCIENAAM')['SHAPE.AREA'].to_dict()
-    count_df['area'] = count_df['Provincie'].map(area_dict)
-    count_df['area'] = count_df['area'] / 10**9
-    count_df['per_km2'] = count_df.groupby('Provincie')['cum_count'].transform(lambda x: x / x.max())  # Normalize per maximum cum_count
-    
-    return count_df
-cumcount_df = create_cumcount(df_laadpaal, gdf_provincies)
+# Kubus met het aantal laadpalen per provincie en jaar, eenmalig berekend per versie van de dataset
+with instrument.section('kubus'):
+    cumcount_df = views.get('station_count_cube')
 
 # Neem de geselecteerde waardes en filter hiermee de data op jaar en provincie
 # User input for selecting regions:
-def get_selected_prov(data):
+# De provincies komen uit de grenzen, niet uit de laadpalen: daar staat NaN bij laadpalen buiten de grenzen
+all_prov = sorted(gdf_provincies['PROVINCIENAAM'])
+def get_selected_prov(options):
     selected_options = st.multiselect(
         "Selecteer Provincie",
-        options=data['Provincie'].unique().tolist(),
+        options=options,
         key="prov_multiselect"
     )
     return selected_options
-selected_prov = get_selected_prov(df_laadpaal)
+selected_prov = get_selected_prov(all_prov)
 
 # Als er geen zijn geselecteerd:
 if len(selected_prov) < 1:
-    selected_prov = df_laadpaal['Provincie'].unique().tolist()
+    selected_prov = all_prov
     
 # Slider voor jaren
 def get_selected_year():
@@ -88,14 +82,26 @@ elif selected_data == 'Cumulatief aantal laadpalen':
 elif selected_data == 'Laadpalen per km2':
     data_column = 'per_km2'
 
+# Laadpalen als markers, of als dichtheid in een grid van hexagonen (ook met alle provincies geselecteerd)
+hex_options = {f'Hexagonen van {size_km} km': size_km for size_km in HEX_SIZES_KM}
+selected_layer = st.selectbox('Toon de laadpalen als', ['Markers', *hex_options])
+
 st.caption('''
 *Selecteer 'Cumulatief aantal laadpalen' om te zien hoeveel laadpalen er op dat moment in de provincie aanwezig zijn. Met 'Aantal laadpalen' is alleen zichtbaar hoeveel nieuwe laadpalen er in dat jaar geregistreerd zijn.
 Of selecteer 'Laadpalen per km2' om de dichtheid van laadpalen per provincie te vergelijken.
 ''')
 
-# Filter de data op jaar en provincie
-prov_selection = gdf_provincies[gdf_provincies['PROVINCIENAAM'].isin(selected_prov)]
-cumcount_selection = cumcount_df[cumcount_df['Year'].astype(int) == selected_year]
+# Meld laadpalen die bij het inladen in geen enkele provincie vielen
+unassigned = df_laadpaal.attrs.get('unassigned_stations', 0)
+if unassigned:
+    st.caption(f'{unassigned} laadpalen liggen buiten de provinciegrenzen; alleen de hexagonen tellen ze mee, '
+               'als alle provincies zijn geselecteerd.')
+all_selected = set(selected_prov) == set(all_prov)
+if selected_layer == 'Markers' and all_selected:
+    st.caption('Met alle provincies geselecteerd worden geen markers getoond; kies hexagonen voor de dichtheid.')
+
+# Filter de data op jaar
+cumcount_selection = station_counts_for_year(cumcount_df, selected_year)
 
 # Bereken de startlocatie en zoom voor de Map op basis van de geselecteerde provincie
 location = [52.1326, 5.2913]
@@ -104,47 +110,26 @@ zoom = 7
 if len(selected_prov) > 1:
     location = [52.1326, 5.2913]
     zoom = 7
-# Zoom in als er maar 1 prov is geselecteerd
+# Zoom in als er maar 1 prov is geselecteerd, op het vooraf berekende middelpunt
 elif len(selected_prov) == 1:
-    prov_selection = prov_selection.to_crs(epsg=4326)
-    centroid = prov_selection.geometry.centroid.iloc[0]
-    lat = centroid.y
-    lng = centroid.x
-    location = [lat, lng]
+    centroid = gdf_provincies.set_index('PROVINCIENAAM').loc[selected_prov[0]]
+    location = [centroid['centroid_lat'], centroid['centroid_lon']]
     zoom = 9
 
+# Vereenvoudigde provinciegrenzen voor dit zoomniveau
+prov_selection = province_layer(gdf_provincies, zoom, selected_prov)
+
 # Maak een choropleth Map van de Laadpalen data
+@instrument.instrumented('kaart')
 def create_choropleth(Laadpalen):
     m = folium.Map(location=location, zoom_start=zoom, tiles='CartoDB positron')
     
-    # Voeg de markers toe
-    prov_markers = None;
-    if len(selected_prov) < 12:
-        prov_markers = MarkerCluster().add_to(m)
-    
-    # Definieer de markers voor het Marker Cluster
-    if data_column == 'count':
-        Laadpalen_markers = Laadpalen[(Laadpalen['Year'].astype(int) == selected_year) & (Laadpalen['Provincie'].isin(selected_prov))]
-    elif data_column == 'cum_count':
-        Laadpalen_markers = Laadpalen[
-            (Laadpalen['Year'].astype(int) <= selected_year) &  # Include all years before and including the selected year
-            (Laadpalen['Provincie'].isin(selected_prov))
-        ]
-    
-    # Voor elke locatie, maak een marker en voeg deze toe aan het cluster
-    if prov_markers:
-        for index, row in Laadpalen_markers.iterrows():
-            folium.Marker(
-                [row['AddressInfo.Latitude'],
-                 row['AddressInfo.Longitude']],
-                popup=row['Connection.Level.Title'],
-                icon=folium.map.Icon(
-                    color='green',
-                    icon_color='white',
-                    icon='bolt',
-                    prefix='fa',
-                )
-            ).add_to(prov_markers)
+    # Voeg de markers toe als één FastMarkerCluster laag: de markers worden in de browser gemaakt
+    # en boven MARKER_BUDGET eerst op de server in een grid samengevoegd
+    if selected_layer == 'Markers' and not all_selected and data_column in ('count', 'cum_count'):
+        markers = station_markers(Laadpalen, dataset_version(Laadpalen))
+        selection = select_markers(markers, selected_prov, selected_year, cumulative=data_column == 'cum_count')
+        marker_cluster(selection['lat'], selection['lon'], selection['codes'], markers['labels']).add_to(m)
         
     folium.Choropleth(
         geo_data=prov_selection,
@@ -156,7 +141,37 @@ def create_choropleth(Laadpalen):
         fill_opacity=0.5,
         legend_name=f'{selected_data} per Nederlandse provincie',
     ).add_to(m)
-    
-    st.map = st_folium(m, width=700, height=600)
 
-create_choropleth(df_laadpaal)
\ No newline at end of file
+    # De dichtheidslaag boven de provincies: alleen niet-lege hexagonen, cumulatief tenzij
+    # 'Aantal laadpalen' is gekozen
+    if selected_layer in hex_options:
+        size_km = hex_options[selected_layer]
+        cells = select_hex_cells(views.get('station_hex_counts'), size_km, None if all_selected else selected_prov,
+                                 selected_year, cumulative=data_column != 'count')
+        layer, legend = hex_layer(cells['q'], cells['r'], cells['count'], size_km)
+        layer.add_to(m)
+        legend.add_to(m)
+    
+    instrument.add_payload(lambda: len(m.get_root().render()))
+    return st_folium(m, width=700, height=600)
+
+map_state = create_choropleth(df_laadpaal)
+
+# Zoek de laadpalen rond het punt waar op de kaart is geklikt, met de gecachte zoekboom van data.nearest
+st.subheader('Laadpalen in de buurt')
+clicked = (map_state or {}).get('last_clicked')
+if not clicked:
+    st.caption('Klik op de kaart om de laadpalen rond dat punt te zoeken.')
+else:
+    radius_km = st.slider('Straal in km', min_value=1, max_value=50, value=5)
+    fast_only = st.checkbox('Alleen snelladers')
+    with instrument.section('zoeken'):
+        index = nearest.station_index(views.get('station_search_data'))
+        in_radius = nearest.within_radius(index, clicked['lat'], clicked['lng'], radius_km, fast_only)
+        closest = nearest.k_nearest(index, clicked['lat'], clicked['lng'], k=10, fast_only=fast_only)
+    n_fast = int(in_radius[nearest.FAST].fillna(False).sum())
+    st.write(f"{len(in_radius)} laadpalen binnen {radius_km} km van ({clicked['lat']:.4f}, {clicked['lng']:.4f}), "
+             f"waarvan {n_fast} snelladers. De 10 dichtstbijzijnde:")
+    st.dataframe(closest, hide_index=True)
+
+instrument.debug_panel()
@@ -0,0 +1,33 @@
+import json
+import os
+
+import pandas as pd
+
+from data import cache
+
+
+def test_touched_source_reuses_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    source = tmp_path / 'bron.csv'
+    source.write_text('a\n1\n2\n')
+    builds = []
+
+    def build():
+        builds.append(1)
+        return pd.read_csv(source)
+
+    first = cache.load_cached('bron', [str(source)], 1, build)
+    # Alleen de mtime verandert: de hash is gelijk, dus geen nieuwe build maar wel nieuwe meta
+    os.utime(source, ns=(0, 0))
+    with open(os.path.join(cache.CACHE_DIR, 'bron.json')) as file:
+        meta = json.load(file)
+    assert cache._is_valid(meta, [str(source)], 1) == (True, True)
+    assert cache._is_valid(meta, [str(source)], 2) == (False, False)
+    second = cache.load_cached('bron', [str(source)], 1, build)
+    assert len(builds) == 1 and second.attrs['version'] == first.attrs['version']
+    assert cache.load_cached('bron', [str(source)], 1, build).attrs['version'] == first.attrs['version']
+    assert len(builds) == 1
+
+    source.write_text('a\n3\n')
+    assert cache.load_cached('bron', [str(source)], 1, build)['a'].tolist() == [3]
+    assert len(builds) == 2
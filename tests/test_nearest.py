@@ -0,0 +1,25 @@
+import pandas as pd
+
+from data import nearest
+
+
+def stations(fast):
+    data = pd.DataFrame({'AddressInfo.Latitude': [52.09, 52.10, 52.37], 'AddressInfo.Longitude': [5.12, 5.13, 4.90],
+                         nearest.FAST: fast})
+    data.attrs['version'] = f'test-{fast}'
+    return data
+
+
+def test_fast_only_without_fast_chargers():
+    index = nearest.station_index(stations([False, None, False]))
+    assert nearest.within_radius(index, 52.09, 5.12, radius_km=100, fast_only=True).empty
+    assert nearest.k_nearest(index, 52.09, 5.12, k=5, fast_only=True).empty
+    assert nearest.count_within_radius(index, 52.09, 5.12, radius_km=100, fast_only=True) == 0
+    assert len(nearest.k_nearest(index, 52.09, 5.12, k=5)) == 3
+
+
+def test_fast_only_finds_nearest_fast_charger():
+    index = nearest.station_index(stations([False, False, True]))
+    closest = nearest.k_nearest(index, 52.09, 5.12, k=1, fast_only=True)
+    assert closest['AddressInfo.Latitude'].tolist() == [52.37]
+    assert nearest.count_within_radius(index, 52.09, 5.12, radius_km=2, fast_only=True) == 0
@@ -0,0 +1,93 @@
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from data import ocm_ingest
+
+# Een lokale stand-in voor de Open Charge Map API: geeft de laadpalen uit POIS terug, gefilterd op
+# modifiedsince (DateLastStatusUpdate) en greaterthanid, en per pagina maximaal maxresults.
+
+
+def poi(id, updated):
+    return {
+        'ID': id,
+        'DateCreated': '2020-01-01T00:00:00Z',
+        'DateLastStatusUpdate': updated,
+        'OperatorInfo': {'Title': 'Operator'},
+        'AddressInfo': {'AddressLine1': f'Straat {id}', 'Town': 'Utrecht', 'Latitude': 52.09, 'Longitude': 5.12},
+        'Connections': [{'PowerKW': 22.0, 'Level': {'Title': 'Level 2', 'IsFastChargeCapable': False}}],
+    }
+
+
+class StandIn(BaseHTTPRequestHandler):
+    pois = []
+    requests = []
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        StandIn.requests.append(params)
+        pois = sorted(self.pois, key=lambda poi: poi['ID'])
+        if 'modifiedsince' in params:
+            since = datetime.fromisoformat(params['modifiedsince'])
+            pois = [poi for poi in pois if datetime.fromisoformat(poi['DateLastStatusUpdate'][:19]) >= since]
+        pois = [poi for poi in pois if poi['ID'] > int(params.get('greaterthanid', 0))][:int(params['maxresults'])]
+        body = json.dumps(pois).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    StandIn.pois, StandIn.requests = [], []
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), StandIn)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}/'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_paged_delta(server, tmp_path):
+    store = str(tmp_path / 'laadpalen.db')
+    StandIn.pois = [poi(id, '2020-01-01T00:00:00Z') for id in range(1, 6)]
+
+    assert ocm_ingest.sync(store, base_url=server, max_results=2) == 5
+    # Drie pagina's: 2 + 2 + 1, de volgende pagina begint na het hoogste ID
+    assert [request.get('greaterthanid') for request in StandIn.requests] == [None, '2', '4']
+    assert sorted(ocm_ingest.read_store(store)['ID']) == [1, 2, 3, 4, 5]
+
+
+def test_empty_delta_moves_watermark(server, tmp_path):
+    store = str(tmp_path / 'laadpalen.db')
+    StandIn.pois = [poi(id, '2020-01-01T00:00:00Z') for id in range(1, 4)]
+    ocm_ingest.sync(store, base_url=server)
+    first = ocm_ingest.last_sync(store)
+
+    # Niets gewijzigd sinds de vorige sync: geen fout, geen rijen, wel een nieuwe modifiedsince
+    assert ocm_ingest.sync(store, base_url=server) == 0
+    assert 'modifiedsince' in StandIn.requests[-1]
+    assert ocm_ingest.last_sync(store) > first
+    assert len(ocm_ingest.read_store(store)) == 3
+
+
+def test_delta_upserts_changed_rows(server, tmp_path):
+    store = str(tmp_path / 'laadpalen.db')
+    StandIn.pois = [poi(id, '2020-01-01T00:00:00Z') for id in range(1, 4)]
+    ocm_ingest.sync(store, base_url=server)
+
+    changed = poi(2, '2999-01-01T00:00:00Z')
+    changed['AddressInfo']['Town'] = 'Amersfoort'
+    StandIn.pois = [StandIn.pois[0], changed, StandIn.pois[2]]
+    assert ocm_ingest.sync(store, base_url=server) == 1
+    stored = ocm_ingest.read_store(store).set_index('ID')
+    assert len(stored) == 3 and stored.loc[2, 'AddressInfo.Town'] == 'Amersfoort'
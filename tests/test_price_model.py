@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+
+from data import price_model
+
+
+def cars(n=200):
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({
+        'Merk': rng.choice(['KIA', 'TESLA'], n),
+        'Aantal zitplaatsen': rng.integers(2, 8, n).astype(float),
+        'Lengte': rng.uniform(350, 500, n),
+        'Breedte': rng.uniform(160, 200, n),
+        'Vermogen massarijklaar': rng.uniform(0.05, 0.3, n),
+    })
+    data['Catalogusprijs'] = 100 * data['Lengte'] + 200000 * data['Vermogen massarijklaar']
+    data.attrs['version'] = 'cars-test'
+    return data
+
+
+def test_pipeline_is_reused_after_a_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(price_model, 'CACHE_DIR', str(tmp_path))
+    data = cars()
+    model = price_model.load_price_model(data, 'cars-test')
+    assert set(model) == {'results', 'brand_means', 'brand_residuals', 'trendline'}
+    prediction = price_model.predict_price(data, {'Aantal zitplaatsen': 5, 'Lengte': 450, 'Breedte': 180,
+                                                 'Vermogen massarijklaar': 0.15})
+    assert abs(prediction - 75000) < 5000
+
+    # Een nieuw proces: de caches zijn leeg, het model wordt uit de artifacts geladen en niet opnieuw getraind
+    price_model.load_price_model.clear()
+    price_model.load_price_pipeline.clear()
+    monkeypatch.setattr(price_model, 'train_price_model', lambda data: 1 / 0)
+    pipeline = price_model.load_price_pipeline(data, 'cars-test')
+    features = pd.DataFrame([[5, 450, 180, 0.15]], columns=price_model.FEATURES)
+    assert float(pipeline.predict(features)[0]) == prediction
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import registry
+
+
+@pytest.fixture
+def frozen():
+    return registry.freeze(pd.DataFrame({'Kosten': [1.0, np.nan, 3.0], 'Stad': ['Utrecht', 'Breda', None],
+                                         'Jaar': [2020, 2021, 2022]}))
+
+
+@pytest.mark.parametrize('column, value', [('Kosten', 0.0), ('Stad', 'Delft'), ('Jaar', 0)])
+def test_arrays_are_read_only(frozen, column, value):
+    with pytest.raises(ValueError):
+        frozen[column].values[:] = value
+    with pytest.raises(ValueError):
+        frozen.head(2)[column].values[0] = value
+    with pytest.raises(TypeError):
+        frozen[column] = value
+
+
+def test_median_and_comparisons_work_on_frozen_arrays(frozen):
+    assert frozen['Kosten'].median() == 2.0
+    assert frozen.median(numeric_only=True).tolist() == [2.0, 2021.0]
+    assert (frozen['Stad'] == 'Utrecht').tolist() == [True, False, False]
+    assert (frozen.head(2)['Stad'] != 'Utrecht').tolist() == [False, True]
+    assert (frozen['Stad'].iloc[1:] == 'Breda').tolist() == [True, False]
+    assert len(frozen[frozen['Stad'] == 'Breda']) == 1
+    # De bron is niet aangepast
+    assert frozen['Kosten'].isna().tolist() == [False, True, False]
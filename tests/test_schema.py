@@ -0,0 +1,38 @@
+import warnings
+
+import pandas as pd
+
+from data.OpenDataRDW import RDW_DATE_FORMAT
+from data.schema import DATETIME, read_csv_typed
+
+SCHEMA = {'Merk': 'category', 'Datum': (DATETIME, RDW_DATE_FORMAT), 'Gemaakt': DATETIME}
+
+
+def test_dates_with_format(tmp_path):
+    path = tmp_path / 'auto.csv'
+    path.write_text('Merk,Datum,Gemaakt\nKIA,04/27/2023 12:00:00 AM,2023-04-27\nKIA,10/06/2016 01:30:00 PM,2016-10-06\n')
+    with warnings.catch_warnings():
+        # Met het formaat valt pandas niet terug op dateutil (dat geeft deze waarschuwing)
+        warnings.simplefilter('error')
+        data = read_csv_typed(str(path), SCHEMA)
+    assert data['Datum'].tolist() == [pd.Timestamp('2023-04-27'), pd.Timestamp('2016-10-06 13:30')]
+    assert data['Gemaakt'].dtype == 'datetime64[ns]' and data['Merk'].dtype == 'category'
+
+
+def test_other_format_falls_back_to_inference(tmp_path):
+    path = tmp_path / 'auto.csv'
+    path.write_text('Merk,Datum\nKIA,2023-04-27\nKIA,onbekend\n')
+    data = read_csv_typed(str(path), SCHEMA)
+    assert data['Datum'].iloc[0] == pd.Timestamp('2023-04-27') and pd.isna(data['Datum'].iloc[1])
+
+
+def test_streamed_chunks_use_the_date_format(tmp_path):
+    from data import OpenDataRDW
+    path = tmp_path / 'car_data.csv'
+    path.write_text('Merk,Handelsbenaming,Eerste kleur,Catalogusprijs,Datum tenaamstelling DT\n'
+                    + 'KIA,KIA NIRO,GRIJS,30000,04/27/2023 12:00:00 AM\n' * 3)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        chunks = list(OpenDataRDW._chunks(str(path), chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert all(chunk['Datum tenaamstelling DT'].eq(pd.Timestamp('2023-04-27')).all() for chunk in chunks)
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import sessions
+
+HEADER = 'Started,Ended,TotalEnergy,ConnectedTime,ChargeTime,MaxPower\n'
+
+
+def lines(start, n):
+    # n sessies van een uur, elke sessie een uur na de vorige
+    first = pd.Timestamp('2018-01-01') + pd.Timedelta(hours=start)
+    return [f'{first + pd.Timedelta(hours=i)},{first + pd.Timedelta(hours=i + 1)},{1000 + i},1.0,0.5,3500\n'
+            for i in range(n)]
+
+
+def stored(directory, rows):
+    # De kolommen zoals een lezer ze ziet, en de grootte van de bestanden
+    meta = sessions.read_meta(directory)
+    columns = {name: np.fromfile(sessions._column_path(directory, name, meta['generation']), dtype=dtype)
+               for name, dtype in sessions.COLUMNS.items()}
+    return meta, {name: values[:rows] for name, values in columns.items()}, len(columns['Started'])
+
+
+def assert_same_as_rebuild(source, directory, tmp_path):
+    meta = sessions.sync(source, directory)
+    rebuilt = sessions.sync(source, str(tmp_path / 'rebuilt'), rebuild=True)
+    assert meta['rows'] == rebuilt['rows']
+    _, columns, size = stored(directory, meta['rows'])
+    _, expected, _ = stored(str(tmp_path / 'rebuilt'), rebuilt['rows'])
+    assert size == meta['rows']
+    assert (np.diff(columns['Started'].astype(np.int64)) >= 0).all()
+    for name in sessions.COLUMNS:
+        np.testing.assert_array_equal(columns[name], expected[name])
+
+
+def test_failed_append_leaves_no_orphan_rows(tmp_path):
+    source, directory = tmp_path / 'sessions.csv', str(tmp_path / 'store')
+    source.write_text(HEADER + ''.join(lines(0, 20)))
+    assert sessions.sync(str(source), directory)['rows'] == 20
+
+    # De derde chunk van de aanvulling is kapot: de eerste twee staan al in de bestanden
+    tail = lines(20, 20)
+    tail[12] = '2018-01-02 08:00:00,"kapot\n'
+    source.write_text(HEADER + ''.join(lines(0, 20)) + ''.join(tail))
+    with pytest.raises(Exception):
+        sessions.sync(str(source), directory, chunksize=5)
+    assert sessions.read_meta(directory)['rows'] == 20
+
+    source.write_text(HEADER + ''.join(lines(0, 20)) + ''.join(lines(20, 20)))
+    assert_same_as_rebuild(str(source), directory, tmp_path)
+    assert sessions.read_meta(directory)['rows'] == 40
+
+
+def test_partial_line_waits_for_next_sync(tmp_path):
+    source, directory = tmp_path / 'sessions.csv', str(tmp_path / 'store')
+    complete = HEADER + ''.join(lines(0, 10))
+    last = lines(10, 1)[0]
+    # De laatste regel wordt nog geschreven
+    source.write_text(complete + last[:15])
+    meta = sessions.sync(str(source), directory)
+    assert meta['rows'] == 10 and meta['source']['size'] == len(complete.encode())
+
+    source.write_text(complete + last)
+    assert sessions.sync(str(source), directory)['rows'] == 11
+    assert_same_as_rebuild(str(source), directory, tmp_path)
+
+
+def test_older_sessions_are_sorted_in(tmp_path):
+    source, directory = tmp_path / 'sessions.csv', str(tmp_path / 'store')
+    source.write_text(HEADER + ''.join(lines(100, 10)))
+    sessions.sync(str(source), directory)
+    source.write_text(HEADER + ''.join(lines(100, 10)) + ''.join(lines(0, 10)))
+    assert_same_as_rebuild(str(source), directory, tmp_path)
+    low, high = sessions.bounds(sessions._open(directory, sessions.read_meta(directory)['key']),
+                                '2018-01-01 00:00', '2018-01-01 05:00')
+    assert (low, high) == (0, 5)
+
+
+def test_store_only_reads(tmp_path, monkeypatch):
+    source, directory = tmp_path / 'sessions.csv', str(tmp_path / 'store')
+    source.write_text(HEADER + ''.join(lines(0, 10)))
+    monkeypatch.setattr(sessions.laadpaaldata, 'SOURCE', str(source))
+    # Zonder sync is er geen opslag, ook niet als de CSV er is
+    assert sessions.store(directory) is None
+    sessions.sync(str(source), directory)
+    source.write_text(HEADER + ''.join(lines(0, 20)))
+    assert sessions.store(directory)['meta']['rows'] == 10
+
+
+def test_sync_waits_for_a_writer_in_another_process(tmp_path):
+    import fcntl
+    import multiprocessing
+    source, directory = tmp_path / 'sessions.csv', str(tmp_path / 'store')
+    source.write_text(HEADER + ''.join(lines(0, 10)))
+    os.makedirs(directory)
+    worker = multiprocessing.get_context('fork').Process(target=sessions.sync, args=(str(source), directory))
+    with open(os.path.join(directory, sessions.LOCK), 'a') as lock_file:
+        # Een andere schrijver (bijvoorbeeld een tweede worker) heeft de opslag
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        worker.start()
+        worker.join(timeout=1)
+        assert worker.is_alive() and not sessions.read_meta(directory)
+    worker.join(timeout=30)
+    assert worker.exitcode == 0
+    assert_same_as_rebuild(str(source), directory, tmp_path)
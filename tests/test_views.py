@@ -0,0 +1,29 @@
+import pandas as pd
+
+from data import views
+
+
+def rdw(brands, version):
+    data = pd.DataFrame({
+        'Merk': pd.Categorical(brands),
+        'Handelsbenaming': pd.Categorical([f'{brand} model' for brand in brands]),
+        'Eerste kleur': pd.Categorical(['GRIJS'] * len(brands)),
+        'Catalogusprijs': [30000.0] * len(brands),
+        'Datum tenaamstelling DT': pd.to_datetime(['2023-01-15'] * len(brands)),
+        'Datum eerste tenaamstelling in Nederland DT': pd.to_datetime(['2023-02-15'] * len(brands)),
+    })
+    data.attrs['version'] = version
+    return data
+
+
+def test_rdw_views_use_the_given_dataset():
+    # Met replace (zoals data/refresh.py via prepare) wordt de view uit de nieuwe versie berekend
+    first, second = rdw(['TESLA', 'TESLA', 'KIA'], 'rdw-test-1'), rdw(['KIA'], 'rdw-test-2')
+    for data, counts in [(first, {'TESLA': 2, 'KIA': 1}), (second, {'KIA': 1})]:
+        replace = {'rdw': data}
+        brands = views.compute('rdw_brand_counts', replace).set_index('Merk')['count']
+        assert brands.to_dict() == counts
+        assert views.compute('rdw_model_counts', replace)['count'].sum() == len(data)
+        assert views.compute('rdw_color_counts', replace)['count'].sum() == len(data)
+        monthly = views.compute('rdw_monthly', replace).set_index('Month')
+        assert monthly.loc[1, 'Registrations_Tenaamstelling'] == len(data)